@@ -0,0 +1,19 @@
+#! /usr/bin/python3
+
+import os
+
+def replace_file(filename, write, mode='w', **options):
+    # Every save goes through here: write(file) fills a temporary file beside
+    # the target, synced to disk before it is renamed over it, so a crash
+    # mid-save leaves the previous file intact.
+    tmp = f'{filename}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, mode, **options) as out:
+            write(out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,22 @@
+#! /usr/bin/python3
+
+import threading
+import concurrent.futures
+
+def submit(func, *args):
+    # Runs func(*args) on a daemon thread of its own and returns its Future.
+    # A request that hangs cannot be cancelled; in a pool it would hold a
+    # worker and queue later requests behind it until they timed out too.
+    # Callers bound how many they leave running.
+    future = concurrent.futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
@@ -0,0 +1,91 @@
+#! /usr/bin/python3
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+# 'ods-book' is the old path: every sheet built as a list, then pe.save_book_as.
+MODES = ['ods-book', 'ods', 'xlsx', 'csv', 'parquet']
+
+PROBE = '''
+import sys, json, time, resource, tracemalloc
+sys.path.insert(0, {here!r})
+
+def rows(sheet, count, width):
+    yield ['Stock'] + [f'Col{{i}}' for i in range(1, width)]
+    for i in range(count):
+        yield [f'{{sheet}}{{i:06d}}'] + [i * 1.5 + j for j in range(1, width - 2)] + [i % 7 == 0, i]
+
+if {trace}:
+    tracemalloc.start()
+start = time.perf_counter()
+if {mode!r} == 'ods-book':
+    import pyexcel as pe
+    book = {{f'Sheet{{s}}': pe.Sheet([list(row) for row in rows(s, {rows}, {width})], name=f'Sheet{{s}}')
+            for s in range({sheets})}}
+    pe.save_book_as(bookdict=book, dest_file_name={base!r} + '.ods')
+else:
+    import report_writer
+    with report_writer.open_writer({base!r}, {mode!r}) as writer:
+        for s in range({sheets}):
+            writer.sheet(f'Sheet{{s}}', rows(s, {rows}, {width}))
+elapsed = time.perf_counter() - start
+current, peak = tracemalloc.get_traced_memory()
+print(json.dumps({{'seconds': elapsed, 'python_peak': peak,
+                  'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}}))
+'''
+
+def size_of(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+def run(mode, rows, sheets, width, base, trace):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = PROBE.format(here=here, mode=mode, rows=rows, sheets=sheets, width=width, base=base, trace=trace)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(mode, rows, sheets, width, directory):
+    # tracemalloc slows allocation-heavy writers a lot, so time and trace in separate runs.
+    base = os.path.join(directory, mode)
+    probe = run(mode, rows, sheets, width, base, False)
+    if 'error' in probe:
+        return probe
+    probe['python_peak'] = run(mode, rows, sheets, width, base, True).get('python_peak')
+    suffix = {'ods-book': '.ods', 'ods': '.ods', 'xlsx': '.xlsx', 'csv': '', 'parquet': '.parquet'}[mode]
+    probe['bytes'] = size_of(base + suffix)
+    return probe
+
+def main():
+    parser = argparse.ArgumentParser(description='Write time and peak memory of each report format.')
+    parser.add_argument('--rows', type=int, default=10000, help='rows per sheet')
+    parser.add_argument('--sheets', type=int, default=3)
+    parser.add_argument('--width', type=int, default=8, help='columns per row')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--save', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {mode: measure(mode, args.rows, args.sheets, args.width, directory) for mode in args.modes}
+
+    print(f'{args.sheets} sheets x {args.rows} rows x {args.width} columns\n')
+    print('__Format__|_Write (s)_|_Python peak (MB)_|_Max RSS (MB)_|_Size (KB)_')
+    for mode, result in results.items():
+        if 'error' in result:
+            print(f"{mode:9} | {result['error']}")
+            continue
+        print(f"{mode:9} | {result['seconds']:9.2f} | {result['python_peak'] / 2**20:16.1f} "
+              f"| {result['max_rss'] / 2**20:12.1f} | {result['bytes'] / 1024:9.0f}")
+
+    if args.save:
+        with open(args.save, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+if __name__ == '__main__':
+    main()
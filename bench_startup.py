@@ -0,0 +1,75 @@
+#! /usr/bin/python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ENTRY_POINTS = ['portfolio', 'portfolio_csv', 'csv_to_ods']
+HEAVY_MODULES = ['pandas', 'yfinance', 'pyexcel', 'sklearn']
+
+PROBE = '''
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from lazy import is_loaded
+print(json.dumps({{'import': elapsed, 'loaded': [name for name in {heavy!r} if is_loaded(name)]}}))
+'''
+
+def measure(module, runs):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    walls, imports, loaded = [], [], []
+    for run in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True, check=True)
+        walls.append(time.perf_counter() - start)
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        imports.append(probe['import'])
+        loaded = probe['loaded']
+    return {'wall': statistics.median(walls), 'wall_min': min(walls),
+            'import': statistics.median(imports), 'import_min': min(imports), 'heavy_loaded': loaded}
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start latency of each entry point.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a JSON file written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, e.g. 0.25 for 25%%')
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.runs) for module in ENTRY_POINTS}
+
+    print('__Entry point__|__Wall (ms)_|_Import (ms)_|_Heavy modules loaded_')
+    for module, result in results.items():
+        heavy = ', '.join(result['heavy_loaded']) or '-'
+        print(f"{module:14} | {result['wall'] * 1000:10.1f} | {result['import'] * 1000:11.1f} | {heavy}")
+
+    if args.save:
+        with open(args.save, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+    failed = False
+    if args.baseline:
+        with open(args.baseline, 'r') as json_file:
+            baseline = json.load(json_file)
+        for module, result in results.items():
+            if module not in baseline:
+                continue
+            # Best-of-N is far less noisy than the median for a pass/fail check.
+            limit = baseline[module]['import_min'] * (1 + args.tolerance)
+            if result['import_min'] > limit:
+                print(f"Regression: {module} import {result['import_min'] * 1000:.1f} ms > {limit * 1000:.1f} ms")
+                failed = True
+            new_heavy = set(result['heavy_loaded']) - set(baseline[module]['heavy_loaded'])
+            if new_heavy:
+                print(f"Regression: {module} now loads {', '.join(sorted(new_heavy))} at startup")
+                failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#! /usr/bin/python3
+
+import numpy as np
+import profiler
+import market_data
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+WINDOWS = (30, 90, 252)
+
+# (provider, ticker, days in window) -> (stamp, beta). The stamp is the as-of
+# date and the last closes of the ticker and the benchmark, so a revised
+# intraday bar misses; a new stamp replaces the entry, so one is kept per
+# ticker and window however long the session runs.
+_memo = {}
+
+def period(windows=WINDOWS):
+    # Closes needed for the longest window of daily returns.
+    return f'{max(windows) + 1}d'
+
+def _tail_sums(returns, bench, windows):
+    # Sums over the last w days for every window, from one reversed cumulative pass.
+    # Days where either the ticker or the benchmark has no return are skipped.
+    valid = np.isfinite(returns) & np.isfinite(bench)[:, None]
+    x = np.where(valid, returns, 0.0)
+    b = np.where(valid, bench[:, None], 0.0)
+    sums = np.cumsum(np.stack([valid, x, b, x * b, b * b])[:, ::-1], axis=1)
+    return sums[:, np.minimum(windows, len(returns)) - 1]
+
+def regression_betas(returns, bench, windows=WINDOWS):
+    # (windows, tickers) array of cov(r, b) / var(b) over the trailing windows.
+    count, sx, sb, sxb, sbb = _tail_sums(returns, bench, np.asarray(windows))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxb - sx * sb / count
+        var = sbb - sb * sb / count
+        return np.where((count > 1) & (var > 0), cov / var, np.nan)
+
+def betas(closes, benchmark, windows=WINDOWS):
+    # DataFrame of Beta<w> columns per ticker, memoized per window and last
+    # bar; only tickers missing from the memo go through the regression.
+    provider = market_data.get_provider().name
+    last = closes.iloc[-1]
+    bench_last = repr(float(benchmark.reindex(closes.index).iloc[-1]))
+    stamps = {ticker: (closes.index[-1], repr(float(last[ticker])), bench_last) for ticker in closes.columns}
+    columns = [f'Beta{window}' for window in windows]
+    # A window longer than the history is keyed by the days it actually covers.
+    spans = [min(window, len(closes) - 1) for window in windows]
+    todo = [ticker for ticker in closes.columns
+            if any(_memo.get((provider, ticker, span), (None,))[0] != stamps[ticker] for span in spans)]
+    profiler.cache(hits=len(closes.columns) - len(todo), misses=len(todo))
+
+    if todo:
+        returns = closes[todo].ffill().pct_change().iloc[1:].to_numpy(dtype=np.float64)
+        bench = benchmark.reindex(closes.index).ffill().pct_change().iloc[1:].to_numpy(dtype=np.float64)
+        for span, row in zip(spans, regression_betas(returns, bench, windows)):
+            for ticker, value in zip(todo, row.tolist()):
+                _memo[(provider, ticker, span)] = (stamps[ticker], value)
+
+    values = [[_memo[(provider, ticker, span)][1] for span in spans] for ticker in closes.columns]
+    return pd.DataFrame(values, index=closes.columns, columns=columns)
+
+def portfolio_beta(stock_betas, weights):
+    # Beta is linear in returns, so the portfolio's is the value-weighted sum.
+    return stock_betas.mul(weights, axis=0).sum(min_count=1)
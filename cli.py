@@ -0,0 +1,161 @@
+#! /usr/bin/python3
+
+import sys
+import json
+import math
+import argparse
+import commands
+import ledger
+import lots
+import portfolio_io
+import profiler
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+COMMANDS = {
+    'beta': lambda stock_dict, args: commands.beta(stock_dict),
+    'value': lambda stock_dict, args: commands.value(stock_dict),
+    'variation': lambda stock_dict, args: commands.variations(stock_dict),
+    'stats': lambda stock_dict, args: commands.stats(stock_dict, args.stats_period),
+    'sharpe': lambda stock_dict, args: commands.sharpe(stock_dict, args.risk_free),
+    'reg': lambda stock_dict, args: commands.trend(stock_dict, args.period),
+    'candles': lambda stock_dict, args: commands.candles(stock_dict, args.period),
+    'time': lambda stock_dict, args: commands.time_value(stock_dict, args.years, args.interest, args.contribution),
+    'mc': lambda stock_dict, args: commands.monte_carlo(stock_dict, args.years, args.paths, args.mc_period,
+                                                        args.seed, args.workers),
+    'risk': lambda stock_dict, args: commands.risk(stock_dict, args.risk_period, args.confidence, args.shrinkage),
+    'info': lambda stock_dict, args: commands.info(stock_dict),
+    'ratio': lambda stock_dict, args: commands.ratios(stock_dict),
+}
+
+# Commands over the trades in the portfolio's ledger; holdings edited outside it are matched.
+LEDGER_COMMANDS = {
+    'pnl': lambda book, stock_dict, args: commands.pnl(book.lots(args.lots, stock_dict)),
+}
+
+def _label(key):
+    if hasattr(key, 'strftime'):
+        return key.strftime('%Y-%m-%d')
+    return str(key)
+
+def to_json(value):
+    if isinstance(value, pd.DataFrame):
+        return {_label(index): {str(column): to_json(cell) for column, cell in row.items()}
+                for index, row in value.iterrows()}
+    if isinstance(value, pd.Series):
+        return {_label(index): to_json(cell) for index, cell in value.items()}
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def print_table(filename, name, result):
+    print(f'\n== {filename}: {name} ==')
+    for part, value in result.items():
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            print(f'\n{part}:')
+            print(value.to_string())
+        else:
+            print(f'{part}: {value}')
+
+def shrinkage(value):
+    if value in ('oas', 'none'):
+        return None if value == 'none' else value
+    intensity = float(value)
+    if not 0 <= intensity <= 1:
+        raise argparse.ArgumentTypeError('shrinkage intensity must be in [0, 1]')
+    return intensity
+
+def parser():
+    parser = argparse.ArgumentParser(prog='portfolio.py', description='Run portfolio commands without the menu.')
+    parser.add_argument('commands', nargs='+', choices=sorted({**COMMANDS, **LEDGER_COMMANDS}), metavar='command',
+                        help='one or more of: ' + ', '.join({**COMMANDS, **LEDGER_COMMANDS}))
+    parser.add_argument('-f', '--file', nargs='+', required=True, dest='files',
+                        help='portfolio .json or .csv files')
+    parser.add_argument('--format', choices=['json', 'table'], default='json')
+    parser.add_argument('-o', '--output', help='write to this file instead of stdout')
+    parser.add_argument('--period', default='20d', help='period for reg and candles (default 20d)')
+    parser.add_argument('--stats-period', nargs='+', default=['2mo'],
+                        help='one or more lookback windows for stats, e.g. 20d 2mo 6mo 1y (default 2mo)')
+    parser.add_argument('--risk-free', type=float, default=0.0, help='daily risk-free rate for sharpe')
+    parser.add_argument('--years', type=int, default=10, help='years for time')
+    parser.add_argument('--interest', type=float, default=0.1, help='interest rate as a decimal for time')
+    parser.add_argument('--contribution', type=float, default=0.0,
+                        help='yearly contribution for time, negative to withdraw')
+    parser.add_argument('--risk-period', default='1y', help='history of daily returns for risk (default 1y)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='VaR/CVaR confidence for risk')
+    parser.add_argument('--shrinkage', type=shrinkage, default='oas',
+                        help="covariance shrinkage for risk: 'oas', 'none' or an intensity in [0, 1]")
+    parser.add_argument('--paths', type=int, default=100000, help='simulated paths for mc')
+    parser.add_argument('--mc-period', default='1y', help='history of daily returns sampled by mc (default 1y)')
+    parser.add_argument('--seed', type=int, help='random seed for mc')
+    parser.add_argument('--workers', type=int, default=1, help='processes for mc')
+    parser.add_argument('--lots', choices=lots.METHODS, default='fifo', help='lot method for pnl (default fifo)')
+    parser.add_argument('--profile', nargs='?', const=True, metavar='TRACE',
+                        help='time each command and write a JSON trace (to TRACE if given)')
+    return parser
+
+def run(args):
+    # Market data is cached per process, so later files and commands reuse earlier fetches.
+    report = {}
+    failed = False
+    for filename in args.files:
+        report[filename] = {}
+        try:
+            stock_dict, errors = portfolio_io.load_file(filename)
+        except OSError as e:
+            report[filename]['error'] = str(e)
+            failed = True
+            continue
+        if errors:
+            report[filename]['skipped'] = [{'line': line, 'error': message} for line, message in errors]
+
+        for name in args.commands:
+            try:
+                with profiler.span(name):
+                    if name in LEDGER_COMMANDS:
+                        book = ledger.Ledger(ledger.ledger_dir(filename))
+                        report[filename][name] = LEDGER_COMMANDS[name](book, stock_dict, args)
+                    else:
+                        report[filename][name] = COMMANDS[name](stock_dict, args)
+            except Exception as e:
+                report[filename][name] = {'error': str(e)}
+                failed = True
+    return report, failed
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.profile:
+        profiler.enable(None if args.profile is True else args.profile)
+    report, failed = run(args)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(to_json(report), out, indent=2)
+            out.write('\n')
+        else:
+            stdout, sys.stdout = sys.stdout, out
+            try:
+                for filename, results in report.items():
+                    for name, result in results.items():
+                        if isinstance(result, dict):
+                            print_table(filename, name, result)
+                        else:
+                            print(f'\n== {filename}: {name} ==\n{result}')
+            finally:
+                sys.stdout = stdout
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#! /usr/bin/python3
+
+import history_cache
+import series_store
+import market_data
+import valuation
+import regression
+import fundamentals
+import growth
+import stats_engine
+import risk_engine
+import beta_engine
+import montecarlo
+import shares_store
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Each command returns a dict of named parts: DataFrames indexed by stock
+# (or date) plus plain scalars. The menu prints them, the CLI serializes them.
+
+IBOV = '^BVSP'
+
+def variation(current, past):
+    data = current - past
+    data = data / past
+    return round(data * 100, 2)
+
+def position_series(stock_dict):
+    shares = pd.Series(stock_dict.shares, index=stock_dict.symbols, dtype=float)
+    totals = pd.Series(stock_dict.totals, index=stock_dict.symbols, dtype=float)
+    return shares, totals
+
+def beta(stock_dict):
+    symbols = list(stock_dict.keys())
+    closes = series_store.closes(symbols + [IBOV], period=beta_engine.period()).ffill()
+    current = closes.iloc[-1]
+    past = closes.iloc[-2]
+
+    var = variation(current, past)
+    ibov_var = var[IBOV]
+    stock_betas = beta_engine.betas(closes[symbols], closes[IBOV])
+    stocks = pd.DataFrame({'Current': current, 'Close': past, 'Delta1': current - past,
+                           'Delta2': var}).reindex(symbols).join(stock_betas)
+
+    shares, totals = position_series(stock_dict)
+    total_inv = (stocks['Close'] * shares).sum()
+    port_var = (stocks['Delta1'] * shares).sum() / total_inv * 100
+    weights = stocks['Current'] * shares / (stocks['Current'] * shares).sum()
+    return {'stocks': stocks, 'portfolio_var': port_var, 'ibov_var': ibov_var,
+            'beta': beta_engine.portfolio_beta(stock_betas, weights)}
+
+def value(stock_dict):
+    symbols = list(stock_dict.keys())
+    closes = history_cache.closes(symbols, period='1d')
+    current = closes.ffill().iloc[-1].reindex(symbols)
+    shares, totals = position_series(stock_dict)
+
+    average = pd.Series(stock_dict.averages(), index=shares.index)
+    delta1 = current - average
+    delta2 = (delta1 / average).where(average != 0, 0.0) * 100
+    volume = current * shares
+    stocks = pd.DataFrame({'Avg': average, 'Current': current, 'Volume': volume,
+                           'Delta1': delta1, 'Delta2': delta2, 'Delta3': volume - totals})
+
+    invested = round(stock_dict.invested, 2)
+    total = float(volume.sum())
+    delta = total - invested
+    return {'stocks': stocks, 'invested': invested, 'value': total, 'delta1': delta,
+            'delta2': delta / invested * 100 if invested > 0 else 0.0}
+
+def info(stock_dict):
+    symbols = list(stock_dict.keys())
+    current = history_cache.closes(symbols, period='1d').ffill().iloc[-1].reindex(symbols)
+    stocks, failed = shares_store.market_caps(symbols, current)
+    return {'stocks': stocks.dropna(subset=['Shares']), 'failed': failed}
+
+def history(stock, period='1mo'):
+    return {'days': market_data.get_provider().history(stock, period=period)}
+
+def variations(stock_dict):
+    symbols = list(stock_dict.keys())
+    closes = series_store.closes(symbols, period='1y').ffill()
+    current = closes.iloc[-1]
+    stocks = pd.DataFrame({'Current': current,
+                           '1day': variation(current, closes.iloc[-2]),
+                           '7days': variation(current, closes.iloc[-5]),
+                           '30days': variation(current, closes.iloc[-22]),
+                           '365days': variation(current, closes.bfill().iloc[0])})
+    return {'stocks': stocks.reindex(symbols)}
+
+def stats(stock_dict, periods=('2mo',)):
+    # One close matrix for the longest window; each window is a slice of it.
+    symbols = list(stock_dict.keys())
+    closes = series_store.closes(symbols + [IBOV], period=stats_engine.longest(periods))
+    windows = stats_engine.window_stats(closes[symbols], closes[IBOV], periods)
+    for stocks in windows.values():
+        stocks['(C-M)/S'] *= 100
+    return windows
+
+_risk_windows = {}
+
+def _window_covariance(symbols, returns):
+    # Update the previous call's covariance for these holdings: drop the days that left
+    # the window, add the new ones and redo only the days whose closes were revised.
+    key = (market_data.get_provider().name, tuple(symbols))
+    cached = _risk_windows.get(key)
+    if cached is None:
+        cov = risk_engine.Covariance.from_returns(returns.to_numpy())
+    else:
+        cov, previous = cached
+        common = previous.index.intersection(returns.index)
+        old = previous.loc[common].to_numpy()
+        new = returns.loc[common].to_numpy()
+        changed = (old != new).any(axis=1)
+        cov.remove(previous.drop(common).to_numpy())
+        cov.remove(old[changed])
+        cov.add(new[changed])
+        cov.add(returns.drop(common).to_numpy())
+    _risk_windows[key] = (cov, returns)
+    return cov
+
+def risk(stock_dict, period='1y', confidence=0.95, shrinkage='oas'):
+    symbols = list(stock_dict.keys())
+    closes = series_store.closes(symbols, period=period)
+    returns = risk_engine.returns_matrix(closes)
+    cov, intensity = _window_covariance(symbols, returns).matrix(shrinkage)
+
+    positions = closes.ffill().iloc[-1].fillna(0.0).to_numpy() * stock_dict.shares
+    value = float(positions.sum())
+    weights = positions / value
+    result = risk_engine.measures(cov, returns.to_numpy(), weights, value, confidence)
+
+    annual = risk_engine.TRADING_DAYS ** 0.5
+    stocks = pd.DataFrame({'Weight': weights * 100,
+                           'Vol': np.sqrt(np.diag(cov)) * annual * 100,
+                           'Contribution': result['contribution'] * annual * 100,
+                           'Share': result['contribution'] / result['volatility'] * 100}, index=symbols)
+    return {'stocks': stocks, 'value': value, 'days': len(returns), 'shrinkage': intensity,
+            'confidence': confidence, 'volatility_daily': result['volatility'] * 100,
+            'volatility_annual': result['volatility'] * annual * 100,
+            'var_parametric': result['var_parametric'], 'cvar_parametric': result['cvar_parametric'],
+            'var_historical': result['var_historical'], 'cvar_historical': result['cvar_historical']}
+
+def ratios(stock_dict):
+    symbols = list(stock_dict.keys())
+    results, failed = fundamentals.fetch(symbols)
+    rows = {}
+    for stock_symbol in symbols:
+        if stock_symbol not in results:
+            continue
+        stock = results[stock_symbol]
+        rows[stock_symbol] = {'Current': stock['currentPrice'],
+                              'EBITDA': stock['ebitdaMargins'] * 100,
+                              'ROE': stock['returnOnEquity'] * 100,
+                              'ROA': stock['returnOnAssets'] * 100,
+                              'CRatio': stock['currentRatio'],
+                              '50dAvg': stock['fiftyDayAverage'],
+                              'Beta': stock['beta']}
+    return {'stocks': pd.DataFrame.from_dict(rows, orient='index'), 'failed': failed}
+
+def trend(stock_dict, period='20d'):
+    closes = series_store.closes(list(stock_dict.keys()), period=period)
+    total_inv = round(stock_dict.invested, 2)
+
+    values = valuation.portfolio_value(closes, stock_dict)
+    delta1 = values - total_inv
+    days = pd.DataFrame({'Value': values, 'Delta1': delta1, 'Delta2': delta1 / total_inv * 100})
+
+    periods = len(values) + 1
+    slope, intercept = regression.fit_trend(values.to_numpy())
+
+    positions = valuation.position_values(closes, stock_dict)
+    slopes, intercepts = regression.fit_trend(positions.to_numpy())
+    stocks = pd.DataFrame({'Slope': slopes, 'Forecast': regression.forecast(slopes, intercepts, periods)},
+                          index=positions.columns)
+
+    return {'days': days, 'periods': periods, 'slope': slope, 'intercept': intercept,
+            'forecast': regression.forecast(slope, intercept, periods), 'stocks': stocks}
+
+def candles(stock_dict, period='20d'):
+    symbols = list(stock_dict.keys())
+    hist = {field: series_store.prices(symbols, period=period, field=field) for field in ('Close', 'High', 'Low')}
+
+    days = valuation.portfolio_ohlc(hist, stock_dict)
+    days['Range'] = days['High'] - days['Low']
+    days = days.round(2)
+    periods = len(days) + 1
+
+    columns = ['Close', 'High', 'Low']
+    slopes, intercepts = regression.fit_trend(days[columns].to_numpy())
+    forecast = pd.DataFrame({'Forecast': regression.forecast(slopes, intercepts, periods),
+                             'Slope': slopes, 'Intercept': intercepts}, index=columns)
+    return {'days': days, 'periods': periods, 'forecast': forecast}
+
+def sharpe(stock_dict, risk_free=0.0):
+    closes = series_store.closes(list(stock_dict.keys()), period='1y')
+
+    data_series = valuation.portfolio_value(closes, stock_dict)
+    var_change = data_series.pct_change()
+    std_daily = float(var_change.std())
+    mean_daily = float(var_change.mean())
+    ratio = (mean_daily - risk_free) / std_daily
+
+    return {'std_daily': std_daily, 'std_value': float(data_series.std()),
+            'mean_daily': mean_daily, 'mean_value': float(data_series.mean()),
+            'risk_free': risk_free, 'sharpe': ratio, 'sharpe_annual': ratio * (252**0.5)}
+
+def pnl(lot_book):
+    # Realized and unrealized gains from the lots; closed positions keep their realized part.
+    symbols = list(lot_book.lots)
+    current = series_store.closes(symbols, period='5d').ffill().iloc[-1] if symbols else pd.Series(dtype=float)
+    stocks = lot_book.pnl(current)
+    realized = float(stocks['Realized'].sum())
+    unrealized = float(stocks['Unrealized'].sum())
+    return {'stocks': stocks, 'method': lot_book.method, 'cost': float(stocks['Cost'].sum()),
+            'value': float(stocks['Value'].sum()), 'realized': realized, 'unrealized': unrealized,
+            'total': realized + unrealized}
+
+def monte_carlo(stock_dict, years=10, paths=100000, period='1y', seed=None, workers=1):
+    closes = series_store.closes(list(stock_dict.keys()), period=period)
+    data_series = valuation.portfolio_value(closes, stock_dict)
+    returns = data_series.pct_change().dropna()
+    result = montecarlo.simulate(returns.to_numpy(), float(data_series.iloc[-1]), years, paths, seed, workers)
+
+    columns = [f'{q}%' for q in result['percentiles']]
+    bands = pd.DataFrame(result['bands'], columns=columns, index=pd.RangeIndex(years + 1, name='Year'))
+    bands['Mean'] = result['mean']
+    return {'bands': bands.round(2), 'start': float(data_series.iloc[-1]), 'paths': paths,
+            'days': len(returns), 'seed': result['seed']}
+
+def time_value(stock_dict, years=10, interest=0.1, contribution=0.0):
+    # A yearly contribution (negative to withdraw) is split across positions by invested weight.
+    totals = stock_dict.totals
+    flows = None
+    if contribution and stock_dict.invested > 0:
+        flows = np.full(years, contribution)[:, None] * (totals / totals.sum())[None, :]
+    values = growth.future_values(totals, [interest], years, flows)[0]
+    stocks = pd.DataFrame(values.T.round(2), columns=range(years + 1), index=list(stock_dict.keys()))
+    stocks.loc['Total'] = stocks[:].sum()
+    return {'stocks': stocks}
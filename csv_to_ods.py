@@ -1,24 +1,40 @@
 #! /usr/bin/python3
 
-import yfinance as yf
-import pyexcel as pe
 import os
-import csv
-from sklearn.linear_model import LinearRegression
-import pandas as pd
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+import contextlib
+import concurrent.futures
+import series_store
+import shares_store
+import valuation
+import regression
+import growth
+import stats_engine
+import beta_engine
+import portfolio_io
+import profiler
+import report_writer
+import sheet_cache
+from holdings import Holdings
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
 
 def load_portfolio(filename):
     if os.path.isfile(filename):
-        with open(filename, 'r', newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            next(reader)
-            stock_dict = {}
-            for row in reader:
-                stock_dict[row[0]] = [int(row[1]), float(row[2])]
+        stock_dict, errors = portfolio_io.load_csv(filename)
+        for line, message in errors:
+            print(f'Skipped line {line}: {message}')
         print(f'Loaded {filename} successfully!')
     else:
         print(f'\nFile "{filename}" does not exist.\nLoaded empty portfolio')
-        return {}
+        return Holdings()
     return stock_dict
 
 def calculate_average(shares, total):
@@ -29,10 +45,9 @@ def calculate_average(shares, total):
 
 def to_stock_sheet(stock_dict):
     print('Saving "Stock" sheet...')
-    data_sheet = [['Stock', 'Shares', 'Total (R$)', 'Average (R$)']]
+    yield ['Stock', 'Shares', 'Total (R$)', 'Average (R$)']
     for key, value in stock_dict.items():
-        data_sheet.append([key] + value + [calculate_average(value[0], value[1])])
-    return data_sheet
+        yield [key] + value + [calculate_average(value[0], value[1])]
 
 def variation_delta(current, past):
     current -= past
@@ -43,57 +58,51 @@ def to_beta_sheet(stock_dict):
     print('Saving "Beta" sheet...')
 
     ibovespa_symbol = "^BVSP"
-    ticker = yf.Ticker(ibovespa_symbol)
-    hist = ticker.history(period='2d')
-    ibov_var = round(variation_delta(hist['Close'].iloc[-1], hist['Close'].iloc[0]), 2)
+    symbols = list(stock_dict.keys())
+    closes = series_store.closes(symbols + [ibovespa_symbol], period=beta_engine.period()).ffill()
+    ibov_var = round(variation_delta(closes[ibovespa_symbol].iloc[-1], closes[ibovespa_symbol].iloc[-2]), 2)
+    stock_betas = beta_engine.betas(closes[symbols], closes[ibovespa_symbol])
 
     port_var = 0.0
     total_inv = 0.0
+    current_value = 0.0
 
-    data_sheet = [['Stock', 'Current (R$)', 'Yday (R$)', 'Delta1 (R$)', 'Delta2 (%)', 'Beta']]
+    yield ['Stock', 'Current (R$)', 'Yday (R$)', 'Delta1 (R$)', 'Delta2 (%)'] + list(stock_betas.columns)
     for stock, value in stock_dict.items():
-        ticker = yf.Ticker(stock)
-        hist = ticker.history(period='2d')
-        current = round(float(hist['Close'].iloc[-1]), 2)
-        yday = round(float(hist['Close'].iloc[0]), 2)
+        current = round(float(closes[stock].iloc[-1]), 2)
+        yday = round(float(closes[stock].iloc[-2]), 2)
         delta1 = current - yday
         delta2 = round(variation_delta(current, yday), 2)
-        beta = round(delta2/ibov_var, 2)
 
-        data_sheet.append([stock, current, yday, delta1, delta2, beta])
+        yield [stock, current, yday, delta1, delta2] + [round(beta, 2) for beta in stock_betas.loc[stock].tolist()]
 
         total_inv += yday * value[0]
         port_var += delta1 * value[0]
+        current_value += current * value[0]
 
-    data_sheet.append(['-', '-', '-', '-', '-', '-'])
-    data_sheet.append(['Port Var (%)', 'IBOV Var (%)', 'Beta'])
+    yield ['-'] * (5 + len(stock_betas.columns))
+    yield ['Port Var (%)', 'IBOV Var (%)'] + list(stock_betas.columns)
 
     port_var = port_var / total_inv
     port_var = round(port_var*100, 2)
-    beta = round(port_var/ibov_var, 2)
-
-    data_sheet.append([port_var, ibov_var, beta])
+    weights = pd.Series([closes[stock].iloc[-1] * value[0] / current_value for stock, value in stock_dict.items()], index=symbols)
+    port_beta = beta_engine.portfolio_beta(stock_betas, weights)
 
-    return data_sheet
+    yield [port_var, ibov_var] + [round(beta, 2) for beta in port_beta.tolist()]
 
 def total_invested(stock_dict):
-    total_sum = 0.0
-    for stock, value in stock_dict.items():
-        total_sum += value[1]
-    return round(total_sum, 2)
+    return round(stock_dict.invested, 2)
 
 def to_current_sheet(stock_dict):
     print('Saving "Current" value sheet...')
 
-    data_sheet = [['Stock', 'Shares', 'Average (R$)', 'Current (R$)', 'Total (R$)', 'Delta1 (R$)', 'Delta2 (%)']]
+    yield ['Stock', 'Shares', 'Average (R$)', 'Current (R$)', 'Total (R$)', 'Delta1 (R$)', 'Delta2 (%)']
 
     current_value = 0.0
     total_inv = total_invested(stock_dict)
 
     for stock, value in stock_dict.items():
-        ticker = yf.Ticker(stock)
-        hist = ticker.history(period='1d')
-        current = round(float(hist['Close'].iloc[0]), 2)
+        current = round(float(series_store.window(stock, period='1d').iloc[-1]), 2)
         current_total = round(value[0] * current, 2)
         delta1 = round(current_total - value[1], 2)
         if value[1] != 0:
@@ -102,168 +111,260 @@ def to_current_sheet(stock_dict):
         else:
             delta2 = 0.0
 
-        data_sheet.append([stock, value[0], calculate_average(value[0], value[1]), current, current_total, delta1, delta2])
+        yield [stock, value[0], calculate_average(value[0], value[1]), current, current_total, delta1, delta2]
         current_value += current_total
 
-    data_sheet.append(['-', '-', '-', '-', '-', '-', '-'])
-    data_sheet.append(['Total Inv (R$)', 'Current Val (R$)', 'Delta1 (R$)', 'Delta2 (%)'])
+    yield ['-', '-', '-', '-', '-', '-', '-']
+    yield ['Total Inv (R$)', 'Current Val (R$)', 'Delta1 (R$)', 'Delta2 (%)']
 
     delta1 = round(current_value - total_inv, 2)
     delta2 = round((100 * delta1) / total_inv, 2)
 
-    data_sheet.append([round(total_inv, 2), round(current_value, 2), delta1, delta2])
-
-    return data_sheet
+    yield [round(total_inv, 2), round(current_value, 2), delta1, delta2]
 
 def to_mkt_cap(stock_dict):
     print('Saving "Mkt Cap" sheet...')
 
-    data_sheet = [['Stock', 'Current (R$)', 'Total Shares', 'Mkt. Cap. (R$)']]
+    yield ['Stock', 'Current (R$)', 'Total Shares', 'Mkt. Cap. (R$)']
 
-    for stock in stock_dict.keys():
-        ticker = yf.Ticker(stock)
-        hist = ticker.history(period='1d')
-        current = round(float(hist['Close'].iloc[0]), 2)
-        shares = ticker.get_shares_full(start='2023-01-01', end=None)
-        shares = int(shares.iloc[-1])
-        market = round(shares * current, 2)
+    symbols = list(stock_dict.keys())
+    current = [round(float(series_store.window(stock, period='1d').iloc[-1]), 2) for stock in symbols]
+    caps, failed = shares_store.market_caps(symbols, current)
 
-        data_sheet.append([stock, current, shares, market])
+    # A ticker without share data gets empty cells; failures are listed below.
+    for stock, row in caps.iterrows():
+        if np.isnan(row['Shares']):
+            yield [stock, float(row['Current']), '', '']
+        else:
+            yield [stock, float(row['Current']), int(row['Shares']), round(float(row['MktCap']), 2)]
 
-    return data_sheet
+    if failed:
+        yield ['-', '-', '-', '-']
+        yield ['No shares for', 'Reason']
+        for stock, reason in failed.items():
+            yield [stock, reason]
 
 def to_regn_sheet(stock_dict, p='20d'):
     print(f'Saving {p} Regression "Regn" sheet...')
 
-    tickers = ' '.join(stock_dict.keys())
-    tickers = yf.Tickers(tickers)
-    hist = tickers.history(period=p)
-    closes = hist['Close']
+    closes = series_store.closes(list(stock_dict.keys()), period=p)
     total_inv = total_invested(stock_dict)
 
-    data_dict = {}
-    for index, row in closes.iterrows():
-        sum_items = 0.0
-        for column_name, value in row.items():
-            sum_items += round(stock_dict[column_name][0] * value, 2)
-        data_dict[index] = sum_items
+    values = valuation.portfolio_value(closes, stock_dict)
 
-    data_sheet = [['Date', 'Port Value (R$)', 'Delta1 (R$)', 'Delta2 (%)']]
+    yield ['Date', 'Port Value (R$)', 'Delta1 (R$)', 'Delta2 (%)']
     days = 1
-    df = {'Close': []}
-    for timestamp, sum_items in data_dict.items():
+    sums = []
+    for timestamp, sum_items in values.items():
         days += 1
         date = timestamp.strftime('%Y-%m-%d')
-        df['Close'].append(sum_items)
+        sum_items = round(float(sum_items), 2)
+        sums.append(sum_items)
         delta1 = round(float(sum_items - total_inv), 2)
         delta2 = round(float((100 * delta1) / total_inv), 2)
 
-        data_sheet.append([date, sum_items, delta1, delta2])
+        yield [date, sum_items, delta1, delta2]
 
-    data_sheet.append(['-', '-', '-', '-'])
+    yield ['-', '-', '-', '-']
 
-    df = pd.DataFrame(df)
-    df['Days'] = range(1, days)
-    model = LinearRegression()
-    model.fit(df[['Days']], df['Close'])
-    slope = round(float(model.coef_[0]), 2)
-    intercept = round(float(model.intercept_), 2)
+    slope, intercept = regression.fit_trend(sums)
+    slope = round(slope, 2)
+    intercept = round(intercept, 2)
     regn = round((slope * float(days)) + intercept, 2)
 
-    data_sheet.append(['Period (days)', 'Forecast (days)', 'Forecast (R$)', 'Slope (R$/day)', 'Intercept (R$)'])
-    data_sheet.append([days-1, days, regn, slope, intercept])
-
-    return data_sheet
+    yield ['Period (days)', 'Forecast (days)', 'Forecast (R$)', 'Slope (R$/day)', 'Intercept (R$)']
+    yield [days-1, days, regn, slope, intercept]
 
 def to_variation_sheet(stock_dict):
     print('Saving "Var" sheet...')
 
-    data_sheet = [['Stock', 'Current (R$)', '1day (%)', '7day (%)', '30day (%)', '1year (%)']]
+    yield ['Stock', 'Current (R$)', '1day (%)', '7day (%)', '30day (%)', '1year (%)']
 
+    series_store.sync(stock_dict.keys())
     for stock in stock_dict.keys():
-        ticker = yf.Ticker(stock)
-        hist = ticker.history(period='1y')
-        current = round(float(hist['Close'].iloc[-1]), 2)
-        day1 = variation_delta(current, hist['Close'].iloc[-2])
-        day7 = variation_delta(current, hist['Close'].iloc[-5])
-        day30 = variation_delta(current, hist['Close'].iloc[-22])
-        dayY = variation_delta(current, hist['Close'].iloc[0])
-        data_sheet.append([stock, current, day1, day7, day30, dayY])
-
-    return data_sheet
+        close = series_store.window(stock, period='1y')
+        current = round(float(close.iloc[-1]), 2)
+        day1 = variation_delta(current, close.iloc[-2])
+        day7 = variation_delta(current, close.iloc[-5])
+        day30 = variation_delta(current, close.iloc[-22])
+        dayY = variation_delta(current, close.iloc[0])
+        yield [stock, current, day1, day7, day30, dayY]
 
 def to_stats_sheet(stock_dict, p='2mo'):
     print(f'Saving {p} "Stats" sheet...')
 
     ibovespa_symbol = "^BVSP"
-    ticker = yf.Ticker(ibovespa_symbol)
-    hist = ticker.history(period=p)
-    ibov_change = hist['Close'].pct_change()
+    symbols = list(stock_dict.keys())
+    closes = series_store.closes(symbols + [ibovespa_symbol], period=p)
+    stats = stats_engine.matrix_stats(closes[symbols], closes[ibovespa_symbol])
 
-    data_sheet = [['Stock', 'Current (R$)', 'Mean (R$)', 'Std Dev (R$)', 'IBOV Corr', 'C<M', 'C-M', '(C-M)/S']]
+    yield ['Stock', 'Current (R$)', 'Mean (R$)', 'Std Dev (R$)', 'IBOV Corr', 'C<M', 'C-M', '(C-M)/S']
 
-    for stock in stock_dict.keys():
-        ticker = yf.Ticker(stock)
-        hist = ticker.history(period=p)
-
-        current = round(float(hist['Close'].iloc[-1]), 2)
-        mean = round(float(hist['Close'].mean()), 2)
-        std_dev = round(float(hist['Close'].std()), 2)
-        stock_change = hist['Close'].pct_change()
-        correlation = float(ibov_change.corr(stock_change))
-        test = current < mean
-        delta1 = current - mean
-        delta2 = round(delta1 / std_dev, 2)
-
-        data_sheet.append([stock, current, mean, std_dev, correlation, test, delta1, delta2])
-
-    return data_sheet
-
-def future_value(present, i, t, alist=[]):
-    alist.append(round(present, 2))
-    if t == 0:
-        return alist
-    else:
-        fv = 1 + i
-        present *= fv
-        return future_value(present, i, t-1, alist=alist)
+    for stock, row in stats.iterrows():
+        yield [stock, round(float(row['Current']), 2), round(float(row['Mean']), 2),
+               round(float(row['Std']), 2), float(row['IBOV Corr']), bool(row['C<M']),
+               float(row['C-M']), round(float(row['(C-M)/S']), 2)]
 
 def to_time_sheet(stock_dict, years=10):
     print('Saving "Time" sheet...')
 
     total_inv = total_invested(stock_dict)
 
-    data_sheet = [['Interest X Years'] + list(range(0, years+1))]
-
-    for i in range(-7,10):
-        interest = (1+i) * 0.01
-        data_sheet.append([interest] + future_value(total_inv, interest, years, []))
-
-    return data_sheet
+    yield ['Interest X Years'] + list(range(0, years+1))
+
+    rates = (np.arange(-7, 10) + 1) * 0.01
+    values = growth.portfolio_future_value(total_inv, rates, years).round(2)
+    for interest, row in zip(rates.tolist(), values.tolist()):
+        yield [interest] + row
+
+# (name, builder, reads market data)
+SHEETS = [
+    ('Stocks', to_stock_sheet, False),
+    ('Beta', to_beta_sheet, True),
+    ('Current', to_current_sheet, True),
+    ('Mkt Cap', to_mkt_cap, True),
+    ('Regn', to_regn_sheet, True),
+    ('Var', to_variation_sheet, True),
+    ('Stats', to_stats_sheet, True),
+    ('Time', to_time_sheet, False),
+    ]
+
+def _timed(rows, timings, name):
+    # Time spent inside the builder, excluding the writer's work between rows.
+    spent = 0.0
+    rows = iter(rows)
+    while True:
+        start = time.perf_counter()
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        finally:
+            spent += time.perf_counter() - start
+            timings[name] = spent
+        yield row
+
+def save_report(stock_dict, base, fmt='ods', cache=True):
+    # Returns (timings, names of the sheets served from the sheet cache).
+    timings = {}
+    reused = []
+    holdings = sheet_cache.holdings_digest(stock_dict)
+    market = sheet_cache.market_digest(list(stock_dict.keys()) + ['^BVSP']) if cache else None
+    start = time.perf_counter()
+    with report_writer.open_writer(base, fmt) as writer:
+        for name, builder, uses_market in SHEETS:
+            if cache:
+                key = sheet_cache.sheet_key(name, builder, holdings, market if uses_market else None)
+                rows, hit = sheet_cache.cached_rows(key, builder(stock_dict))
+                if hit:
+                    reused.append(name)
+            else:
+                rows = builder(stock_dict)
+            writer.sheet(name, _timed(profiler.measure_rows(builder.__name__, rows), timings, name))
+    timings['write'] = time.perf_counter() - start - sum(timings.values())
+    return timings, reused
+
+def _report_job(filename, fmt='ods', cache=True, profile=False):
+    start = time.perf_counter()
+    base = os.path.splitext(filename)[0]
+    summary = {'file': filename, 'output': report_writer.output_path(base, fmt)}
+    if profile:
+        # Spans go back to the parent with the summary instead of a trace of their own.
+        profiler.enable(report=False)
+    mark = len(profiler.spans())
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), profiler.span(f'report {os.path.basename(filename)}'):
+            stock_dict, errors = portfolio_io.load_csv(filename)
+            summary['skipped'] = [{'line': line, 'error': message} for line, message in errors]
+            summary['sheets'], summary['reused'] = save_report(stock_dict, base, fmt, cache)
+        summary['status'] = 'ok'
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = f'{type(e).__name__}: {e}'
+    summary['seconds'] = time.perf_counter() - start
+    if profile:
+        summary['profile'] = profiler.spans()[mark:]
+    return summary
+
+def portfolio_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+        else:
+            files.extend(sorted(glob.glob(path)))
+    return list(dict.fromkeys(files))
+
+def batch_reports(files, workers=None, fmt='ods', cache=True):
+    # Fetch the union of tickers once in this process; the workers read it
+    # back from the on-disk series store and shares store.
+    tickers = {'^BVSP'}
+    for filename in files:
+        stock_dict, errors = portfolio_io.load_csv(filename)
+        tickers.update(stock_dict.keys())
+    tickers = sorted(tickers)
+
+    with profiler.span('sync'):
+        series_store.sync(tickers)
+        shares_store.sync([stock for stock in tickers if stock != '^BVSP'])
+
+    profile = profiler.enabled()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=series_store.read_only) as executor:
+        summaries = list(executor.map(_report_job, files, [fmt] * len(files), [cache] * len(files),
+                                      [profile] * len(files)))
+    for summary in summaries:
+        profiler.extend(summary.pop('profile', []))
+    return summaries
+
+def print_summary(summaries):
+    print('\n__Portfolio______________________|_Status_|_Seconds_|')
+    for summary in summaries:
+        print(f"{summary['file']:32} | {summary['status']:6} | {summary['seconds']:7.2f} |")
+        if summary['status'] != 'ok':
+            print(f"    {summary['error']}")
+        if summary.get('reused'):
+            print(f"    reused: {', '.join(summary['reused'])}")
+        for skipped in summary.get('skipped', []):
+            print(f"    skipped line {skipped['line']}: {skipped['error']}")
+    failed = sum(summary['status'] != 'ok' for summary in summaries)
+    print(f'\n{len(summaries) - failed} reports written, {failed} failed.')
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='csv_to_ods.py', description='Build reports for many portfolio CSVs.')
+    parser.add_argument('paths', nargs='+', help='portfolio CSV files, directories or glob patterns')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('-f', '--format', choices=sorted(report_writer.FORMATS), default='ods',
+                        help='ods, xlsx, parquet, or csv for a directory with one CSV per sheet (default ods)')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='rebuild every sheet instead of reusing unchanged ones')
+    parser.add_argument('--summary', default='report_summary.json', help='JSON summary file')
+    parser.add_argument('--profile', nargs='?', const=True, metavar='TRACE',
+                        help='time each sheet builder and write a JSON trace (to TRACE if given)')
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiler.enable(None if args.profile is True else args.profile)
+
+    files = portfolio_files(args.paths)
+    if not files:
+        print('No portfolio files found.')
+        return 1
+
+    summaries = batch_reports(files, args.workers, args.format, args.cache)
+    print_summary(summaries)
+    with open(args.summary, 'w') as json_file:
+        json.dump(summaries, json_file, indent=2)
+    return 0 if all(summary['status'] == 'ok' for summary in summaries) else 1
 
 if __name__ == "__main__":
 
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
+
     filename = input('To load a portfolio, have your .csv in your working directory. \nInput filename: ')
-    ods_filename = filename[:-3] + 'ods'
 
     stock_dict = load_portfolio(filename)
+    series_store.sync(list(stock_dict.keys()) + ['^BVSP'])
 
-    stock_sheet = pe.Sheet(to_stock_sheet(stock_dict), name='Stocks')
-    current_beta_sheet = pe.Sheet(to_beta_sheet(stock_dict), name='Beta')
-    current_value_sheet = pe.Sheet(to_current_sheet(stock_dict), name='Current')
-    mkt_cap_sheet = pe.Sheet(to_mkt_cap(stock_dict), name='Mkt Cap')
-    regn_sheet = pe.Sheet(to_regn_sheet(stock_dict), name='Regn')
-    variation_sheet = pe.Sheet(to_variation_sheet(stock_dict), name='Var')
-    stats_sheet = pe.Sheet(to_stats_sheet(stock_dict), name='Stats')
-    time_sheet = pe.Sheet(to_time_sheet(stock_dict), name='Time')
-
-    pe.save_book_as(bookdict={
-        'Stocks': stock_sheet,
-        'Beta': current_beta_sheet,
-        'Current': current_value_sheet,
-        'Mkt Cap': mkt_cap_sheet,
-        'Regn': regn_sheet,
-        'Var': variation_sheet,
-        'Stats': stats_sheet,
-        'Time': time_sheet,
-        }, dest_file_name=ods_filename)
+    timings, reused = save_report(stock_dict, os.path.splitext(filename)[0])
+    if reused:
+        print('Reused unchanged sheets: ' + ', '.join(reused))
@@ -0,0 +1,157 @@
+#! /usr/bin/python3
+
+import os
+import json
+import time
+import heapq
+import datetime
+import threading
+import concurrent.futures
+import profiler
+import background
+import market_data
+from lazy import lazy_import, resolve
+
+pd = lazy_import('pandas')
+
+CACHE_FILE = os.environ.get('PORTFOLIO_FUNDAMENTALS_CACHE', os.path.join('.cache', 'fundamentals.json'))
+
+# Hung requests cannot be cancelled, so their threads stay alive until they
+# end. No more than MAX_THREADS run at once, abandoned ones included.
+MAX_THREADS = int(os.environ.get('PORTFOLIO_FUNDAMENTALS_THREADS', 16))
+_live = set()
+_lock = threading.Lock()
+
+FIELDS = ['currentPrice', 'ebitdaMargins', 'returnOnEquity', 'returnOnAssets',
+          'currentRatio', 'fiftyDayAverage', 'beta']
+
+class MissingFields(Exception):
+    pass
+
+def _today():
+    return datetime.date.today().isoformat()
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, 'r') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache):
+    directory = os.path.dirname(CACHE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = CACHE_FILE + '.tmp'
+    with open(tmp, 'w') as json_file:
+        json.dump(cache, json_file)
+    os.replace(tmp, CACHE_FILE)
+
+def _fetch_one(provider, symbol):
+    info = provider.info(symbol)
+    missing = [field for field in FIELDS if info.get(field) is None]
+    if missing:
+        raise MissingFields(', '.join(missing))
+    return {field: info[field] for field in FIELDS}
+
+def _release(future):
+    with _lock:
+        _live.discard(future)
+
+def _submit(provider, symbol):
+    # Each request starts (and its deadline runs) right away.
+    future = background.submit(_fetch_one, provider, symbol)
+    with _lock:
+        _live.add(future)
+    future.add_done_callback(_release)
+    return future
+
+def fetch(symbols, workers=8, deadline=15.0, retries=2, backoff=0.5):
+    # Returns ({symbol: fields}, {symbol: reason}). Entries fetched today,
+    # including tickers that lack some fields, are served from the cache.
+    today = _today()
+    provider = market_data.get_provider()
+    cache = load_cache()
+    entries = cache.setdefault(provider.name, {})
+    results = {}
+    failed = {}
+    for symbol in symbols:
+        entry = entries.get(symbol)
+        if entry is not None and entry.get('date') == today:
+            if 'missing' in entry:
+                failed[symbol] = f"missing {entry['missing']}"
+            else:
+                results[symbol] = entry['fields']
+
+    todo = [symbol for symbol in dict.fromkeys(symbols) if symbol not in results and symbol not in failed]
+    profiler.cache(hits=len(results) + len(failed), misses=len(todo))
+    if not todo:
+        return results, failed
+
+    resolve(pd)
+    ready = [(0.0, symbol) for symbol in todo]
+    attempts = dict.fromkeys(todo, 0)
+    pending = {}
+    start = time.monotonic()
+
+    def retry(symbol, reason, now):
+        attempts[symbol] += 1
+        if attempts[symbol] > retries:
+            failed[symbol] = reason
+        else:
+            heapq.heappush(ready, (now + backoff * 2 ** (attempts[symbol] - 1), symbol))
+
+    while ready or pending:
+        now = time.monotonic() - start
+        while ready and ready[0][0] <= now and len(pending) < workers:
+            ready_at, symbol = ready[0]
+            if len(_live) >= MAX_THREADS:
+                # Every thread is taken; the wait for one counts against the deadline.
+                if ready_at + deadline > now:
+                    break
+                heapq.heappop(ready)
+                retry(symbol, f'no free thread after {deadline:.0f}s', now)
+                continue
+            heapq.heappop(ready)
+            pending[_submit(provider, symbol)] = (symbol, now + deadline)
+
+        with _lock:
+            busy = set(_live) if len(_live) >= MAX_THREADS else set()
+        wake = [expires for symbol, expires in pending.values()]
+        if ready and len(pending) < workers:
+            wake.append(ready[0][0] + deadline if busy else ready[0][0])
+        timeout = max(min(wake) - now, 0.0) if wake else None
+        # An abandoned request that ends frees a thread as well.
+        waiting = busy | set(pending)
+        if not waiting:
+            time.sleep(timeout)
+            continue
+        done, waiting = concurrent.futures.wait(waiting, timeout=timeout,
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+
+        now = time.monotonic() - start
+        for future in done:
+            if future not in pending:
+                continue
+            symbol, expires = pending.pop(future)
+            try:
+                results[symbol] = future.result()
+                entries[symbol] = {'date': today, 'fields': results[symbol]}
+            except MissingFields as e:
+                failed[symbol] = f'missing {e}'
+                entries[symbol] = {'date': today, 'missing': str(e)}
+            except Exception as e:
+                retry(symbol, f'{type(e).__name__}: {e}', now)
+
+        for future in [future for future in waiting if future in pending]:
+            symbol, expires = pending[future]
+            if expires <= now:
+                # Abandon the slow request; its thread finishes in the background.
+                del pending[future]
+                retry(symbol, f'timed out after {deadline:.0f}s', now)
+
+    try:
+        save_cache(cache)
+    except OSError:
+        pass
+    return results, failed
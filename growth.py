@@ -0,0 +1,43 @@
+#! /usr/bin/python3
+
+import numpy as np
+
+def growth_factors(rates, years):
+    # (rates, years + 1) array of (1 + r) ** t.
+    rates = np.atleast_1d(np.asarray(rates, dtype=np.float64))
+    if (rates <= -1).any():
+        raise ValueError('Interest rates must be above -100%.')
+    return np.power(1 + rates[:, None], np.arange(years + 1, dtype=np.float64))
+
+def _schedule(flows, years, width):
+    # Cash flow at the end of years 1..years, per position; negative values are withdrawals.
+    flows = np.zeros((years, width)) if flows is None else np.asarray(flows, dtype=np.float64)
+    if flows.ndim == 0:
+        flows = np.full(years, float(flows))
+    if flows.shape[0] != years:
+        raise ValueError(f'Expected {years} yearly flows, got {flows.shape[0]}.')
+    if flows.ndim == 1:
+        flows = flows[:, None]
+    return np.broadcast_to(flows, (years, width))
+
+def future_values(present, rates, years, flows=None):
+    # (rates, years + 1, positions) tensor in one broadcast:
+    #   FV[t] = PV * g**t + sum_{k <= t} flow[k] * g**(t - k)
+    # The flow sum is g**t times the cumulative sum of the discounted flows.
+    present = np.atleast_1d(np.asarray(present, dtype=np.float64))
+    factors = growth_factors(rates, years)
+    values = factors[:, :, None] * present[None, None, :]
+    if flows is not None and years > 0:
+        flows = _schedule(flows, years, len(present))
+        discounted = flows[None, :, :] / factors[:, 1:, None]
+        values[:, 1:, :] += factors[:, 1:, None] * np.cumsum(discounted, axis=1)
+    return values
+
+def portfolio_future_value(present, rates, years, flows=None):
+    # Totals only, (rates, years + 1): sum the positions first, since growth is linear.
+    total = np.asarray(present, dtype=np.float64).sum()
+    if flows is not None:
+        flows = np.asarray(flows, dtype=np.float64)
+        if flows.ndim == 2:
+            flows = flows.sum(axis=1)
+    return future_values([total], rates, years, flows)[:, :, 0]
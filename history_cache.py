@@ -0,0 +1,145 @@
+#! /usr/bin/python3
+
+import os
+import time
+import hashlib
+import profiler
+import market_data
+from market_data import period_days, slice_period
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+CACHE_DIR = os.environ.get('PORTFOLIO_CACHE_DIR', os.path.join('.cache', 'history'))
+CACHE_TTL = float(os.environ.get('PORTFOLIO_CACHE_TTL', 15 * 60))
+CACHE_MAX_BYTES = int(os.environ.get('PORTFOLIO_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# key -> (fetched at, history); expires after CACHE_TTL like the disk tier.
+_memory = {}
+
+def _cache_path(key):
+    name = hashlib.sha1(repr(key).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, name + '.pkl')
+
+def _fresh(fetched):
+    return time.time() - fetched <= CACHE_TTL
+
+def _read_disk(key):
+    # Returns (written at, history) or None.
+    path = _cache_path(key)
+    try:
+        fetched = os.path.getmtime(path)
+    except OSError:
+        return None
+    if not _fresh(fetched):
+        return None
+    try:
+        return fetched, pd.read_pickle(path)
+    except Exception:
+        return None
+
+def _write_disk(key, hist):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    tmp = path + '.tmp'
+    hist.to_pickle(tmp)
+    os.replace(tmp, path)
+    _evict()
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _evict():
+    entries = []
+    total = 0
+    now = time.time()
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if now - stat.st_mtime > CACHE_TTL:
+            _remove(path)
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for mtime, size, path in entries:
+        if total <= CACHE_MAX_BYTES:
+            break
+        _remove(path)
+        total -= size
+
+def _lookup(ticker, period, interval):
+    provider = market_data.get_provider()
+    key = (provider.name, ticker, period, interval)
+    for stale in [c_key for c_key, (fetched, hist) in _memory.items() if not _fresh(fetched)]:
+        del _memory[stale]
+    if key in _memory:
+        return _memory[key][1]
+
+    # A longer period already held in memory covers shorter ones.
+    wanted = period_days(period)
+    for (c_name, c_ticker, c_period, c_interval), (fetched, hist) in _memory.items():
+        if c_name == provider.name and c_ticker == ticker and c_interval == interval \
+                and len(hist) > 0 and wanted < float('inf') and period_days(c_period) >= wanted:
+            return slice_period(hist, period)
+
+    if not provider.remote:
+        return None
+    entry = _read_disk(key)
+    if entry is None:
+        return None
+    _memory[key] = entry
+    return entry[1]
+
+def history(ticker, period='1mo', interval='1d'):
+    hist = _lookup(ticker, period, interval)
+    profiler.cache(hits=hist is not None, misses=hist is None)
+    if hist is None:
+        hist = market_data.get_provider().history(ticker, period=period, interval=interval)
+        store(ticker, hist, period, interval)
+    return hist
+
+def store(ticker, hist, period='1mo', interval='1d'):
+    provider = market_data.get_provider()
+    key = (provider.name, ticker, period, interval)
+    _memory[key] = (time.time(), hist)
+    if provider.remote and len(hist) > 0:
+        _write_disk(key, hist)
+
+def prefetch(tickers, period='1y', interval='1d'):
+    wanted = list(dict.fromkeys(tickers))
+    missing = [ticker for ticker in wanted if _lookup(ticker, period, interval) is None]
+    profiler.cache(hits=len(wanted) - len(missing), misses=len(missing))
+    if not missing:
+        return
+
+    hist = market_data.get_provider().download(missing, period=period, interval=interval)
+    for ticker in missing:
+        if ticker in hist.columns.get_level_values(0):
+            store(ticker, hist[ticker].dropna(how='all'), period, interval)
+        else:
+            store(ticker, pd.DataFrame(), period, interval)
+
+def clear():
+    _memory.clear()
+
+def prices(tickers, period='1mo', interval='1d', field='Close'):
+    prefetch(tickers, period, interval)
+    columns = {}
+    for ticker in tickers:
+        # prefetch has counted this lookup as a hit or a miss already.
+        hist = _lookup(ticker, period, interval)
+        if hist is None:
+            hist = history(ticker, period, interval)
+        columns[ticker] = hist[field] if field in hist else pd.Series(dtype=float)
+    return pd.DataFrame(columns)
+
+def closes(tickers, period='1mo', interval='1d'):
+    return prices(tickers, period, interval, 'Close')
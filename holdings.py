@@ -0,0 +1,162 @@
+#! /usr/bin/python3
+
+import numpy as np
+
+class Holdings:
+    __slots__ = ('_symbols', '_shares', '_totals', '_index', '_size', '_invested')
+
+    def __init__(self, capacity=16):
+        capacity = max(capacity, 1)
+        self._symbols = np.empty(capacity, dtype=object)
+        self._shares = np.zeros(capacity, dtype=np.int64)
+        self._totals = np.zeros(capacity, dtype=np.float64)
+        self._index = {}
+        self._size = 0
+        self._invested = 0.0
+
+    @classmethod
+    def from_dict(cls, stock_dict):
+        holdings = cls(len(stock_dict))
+        for symbol, value in stock_dict.items():
+            holdings.set(symbol, value[0], value[1])
+        return holdings
+
+    @classmethod
+    def from_arrays(cls, symbols, shares, totals):
+        holdings = cls(len(symbols))
+        symbols = symbols.tolist() if isinstance(symbols, np.ndarray) else list(symbols)
+        index = dict(zip(symbols, range(len(symbols))))
+        if len(index) < len(symbols):
+            # Repeated tickers: the last row wins, as with set().
+            for symbol, count, total in zip(symbols, shares, totals):
+                holdings.set(symbol, int(count), float(total))
+            return holdings
+
+        size = len(symbols)
+        holdings._symbols[:size] = symbols
+        holdings._shares[:size] = shares
+        holdings._totals[:size] = totals
+        holdings._index = index
+        holdings._size = size
+        holdings._invested = float(holdings.totals.sum())
+        return holdings
+
+    def to_dict(self):
+        return {symbol: [int(count), float(total)] for symbol, count, total
+                in zip(self.symbols, self.shares, self.totals)}
+
+    # Views over the live part of the buffers; bulk math can run on these directly.
+    @property
+    def symbols(self):
+        return self._symbols[:self._size]
+
+    @property
+    def shares(self):
+        return self._shares[:self._size]
+
+    @property
+    def totals(self):
+        return self._totals[:self._size]
+
+    @property
+    def invested(self):
+        return self._invested
+
+    def _grow(self):
+        capacity = len(self._symbols) * 2
+        for name in ('_symbols', '_shares', '_totals'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _position(self, symbol):
+        position = self._index.get(symbol)
+        if position is None:
+            if self._size == len(self._symbols):
+                self._grow()
+            position = self._size
+            self._symbols[position] = symbol
+            self._shares[position] = 0
+            self._totals[position] = 0.0
+            self._index[symbol] = position
+            self._size += 1
+        return position
+
+    def set(self, symbol, shares, total):
+        position = self._position(symbol)
+        self._invested += total - float(self._totals[position])
+        self._shares[position] = shares
+        self._totals[position] = total
+
+    def buy(self, symbol, shares, price):
+        position = self._position(symbol)
+        self.set(symbol, int(self._shares[position]) + shares, float(self._totals[position]) + shares * price)
+
+    def sell(self, symbol, shares, price):
+        position = self._index[symbol]
+        held = int(self._shares[position])
+        if held < shares:
+            raise ValueError('Cannot short stocks.')
+        # The shares sold take their average cost out of the total; the price
+        # only decides the realized gain, which is returned.
+        total = float(self._totals[position])
+        basis = total * shares / held if held > shares else total
+        self.set(symbol, held - shares, total - basis)
+        return shares * price - basis
+
+    def delete(self, symbol):
+        position = self._index.pop(symbol)
+        self._invested -= float(self._totals[position])
+        # Shift the tail down one slot so the holdings keep their order.
+        for name in ('_symbols', '_shares', '_totals'):
+            array = getattr(self, name)
+            array[position:self._size - 1] = array[position + 1:self._size]
+        self._size -= 1
+        self._symbols[self._size] = None
+        for moved in self._symbols[position:self._size]:
+            self._index[moved] -= 1
+
+    def clear(self):
+        self._symbols[:self._size] = None
+        self._index.clear()
+        self._size = 0
+        self._invested = 0.0
+
+    def averages(self):
+        shares = self.shares
+        averages = np.zeros(self._size)
+        np.divide(self.totals, shares, out=averages, where=shares > 0)
+        return averages.round(2)
+
+    def shares_for(self, symbols):
+        return np.array([self._shares[self._index[symbol]] if symbol in self._index else 0
+                         for symbol in symbols], dtype=float)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(self.symbols.tolist())
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def __getitem__(self, symbol):
+        position = self._index[symbol]
+        return [int(self._shares[position]), float(self._totals[position])]
+
+    def __setitem__(self, symbol, value):
+        self.set(symbol, value[0], value[1])
+
+    def __delitem__(self, symbol):
+        self.delete(symbol)
+
+    def keys(self):
+        return self.symbols.tolist()
+
+    def values(self):
+        return [[int(count), float(total)] for count, total in zip(self.shares, self.totals)]
+
+    def items(self):
+        return list(zip(self.keys(), self.values()))
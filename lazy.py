@@ -0,0 +1,27 @@
+#! /usr/bin/python3
+
+import sys
+import importlib.util
+
+def lazy_import(name):
+    # Register the module now, run its code on first attribute access.
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def is_loaded(name):
+    module = sys.modules.get(name)
+    return module is not None and not isinstance(module, importlib.util._LazyModule)
+
+def resolve(module):
+    # LazyLoader is not thread-safe before 3.12: finish the import before handing it to threads.
+    getattr(module, '__spec__')
+    return module
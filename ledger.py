@@ -0,0 +1,219 @@
+#! /usr/bin/python3
+
+import os
+import json
+import time
+import datetime
+import numpy as np
+from holdings import Holdings
+from lots import LotBook
+
+# One fixed-width little-endian record per trade. 'symbol' indexes the ticker
+# table, so tickers of any length fit; 'value' is the price per share for
+# buy/sell and the position total for set.
+RECORD = np.dtype([('time', '<i8'), ('op', 'u1'), ('symbol', '<u4'), ('shares', '<i8'), ('value', '<f8')])
+SET, BUY, SELL, DELETE, CLEAR = range(5)
+CHECKPOINT_EVERY = int(os.environ.get('PORTFOLIO_LEDGER_CHECKPOINT', 10000))
+REPLAY_CHUNK = 65536
+
+# Layout: <portfolio file>.ledger/entries.bin holds the records in time order;
+# symbols.jsonl the ticker table, one JSON string per line, appended before
+# any record that uses it; checkpoint-<count>.npz the holdings after the
+# first <count> records.
+
+def ledger_dir(filename):
+    return filename + '.ledger'
+
+def _apply(holdings, op, symbol, shares, value):
+    # holdings is a Holdings or a LotBook; both take the same trades.
+    if op == BUY:
+        holdings.buy(symbol, shares, value)
+    elif op == SELL:
+        return holdings.sell(symbol, shares, value)
+    elif op == SET:
+        holdings.set(symbol, shares, value)
+    elif op == DELETE:
+        holdings.delete(symbol)
+    elif op == CLEAR:
+        holdings.clear()
+
+def _day_end(day):
+    # Nanoseconds at local midnight after 'YYYY-MM-DD' (or a date).
+    if isinstance(day, str):
+        day = datetime.date.fromisoformat(day)
+    end = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+    return int(end.timestamp()) * 10**9
+
+def _stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+class Ledger:
+    def __init__(self, path):
+        self.path = path
+        self.entries_path = os.path.join(path, 'entries.bin')
+        self.symbols_path = os.path.join(path, 'symbols.jsonl')
+        self.symbols = self._load_symbols()
+        self._ids = {symbol: index for index, symbol in enumerate(self.symbols)}
+        size = os.path.getsize(self.entries_path) if os.path.exists(self.entries_path) else 0
+        if size % RECORD.itemsize:
+            # A torn append: keep the whole records only.
+            with open(self.entries_path, 'r+b') as entries_file:
+                entries_file.truncate(size - size % RECORD.itemsize)
+        self.count = size // RECORD.itemsize
+        self.last = int(self.entries()['time'][-1]) if self.count else 0
+        self.holdings = self.replay(self.count)
+
+    def _load_symbols(self):
+        try:
+            with open(self.symbols_path, 'r+b') as symbols_file:
+                data = symbols_file.read()
+                # A torn last line has no record pointing at it: drop it
+                # before anything is appended after it.
+                data = data[:data.rfind(b'\n') + 1]
+                symbols_file.truncate(len(data))
+        except OSError:
+            return []
+        return [json.loads(line) for line in data.splitlines()]
+
+    def _symbol_id(self, symbol):
+        index = self._ids.get(symbol)
+        if index is None:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self.symbols_path, 'a') as symbols_file:
+                symbols_file.write(json.dumps(symbol) + '\n')
+            index = self._ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return index
+
+    def entries(self):
+        if self.count == 0:
+            return np.empty(0, dtype=RECORD)
+        return np.memmap(self.entries_path, dtype=RECORD, mode='r', shape=(self.count,))
+
+    def _checkpoints(self):
+        counts = []
+        if not os.path.isdir(self.path):
+            return counts
+        for name in os.listdir(self.path):
+            if name.startswith('checkpoint-') and name.endswith('.npz'):
+                counts.append(int(name[len('checkpoint-'):-len('.npz')]))
+        return sorted(counts)
+
+    def _checkpoint_path(self, count):
+        return os.path.join(self.path, f'checkpoint-{count:012d}.npz')
+
+    def checkpoint(self):
+        path = self._checkpoint_path(self.count)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp,
+                 symbols=np.array(self.holdings.symbols, dtype=str),
+                 shares=self.holdings.shares,
+                 totals=self.holdings.totals)
+        os.replace(tmp, path)
+
+    def _restore(self, stop):
+        # Holdings from the newest readable checkpoint at or before entry 'stop'.
+        for count in reversed([count for count in self._checkpoints() if count <= stop]):
+            try:
+                with np.load(self._checkpoint_path(count), allow_pickle=False) as data:
+                    return Holdings.from_arrays(data['symbols'], data['shares'], data['totals']), count
+            except (OSError, KeyError, ValueError):
+                continue
+        return Holdings(), 0
+
+    def replay(self, stop):
+        # Holdings after the first 'stop' entries, replaying only past the nearest checkpoint.
+        holdings, start = self._restore(stop)
+        self._apply_entries(holdings, start, stop)
+        return holdings
+
+    def _apply_entries(self, target, start, stop):
+        entries = self.entries()
+        for chunk in range(start, stop, REPLAY_CHUNK):
+            for _, op, symbol, shares, value in entries[chunk:min(chunk + REPLAY_CHUNK, stop)].tolist():
+                _apply(target, op, self.symbols[symbol], shares, value)
+
+    def as_of(self, day):
+        # Holdings at the end of a past day. Entries are in time order, so a
+        # binary search over the time column finds where to stop.
+        stop = int(np.searchsorted(self.entries()['time'], _day_end(day), side='left'))
+        return self.replay(stop)
+
+    def lots(self, method='fifo', holdings=None):
+        # Lots need every trade, so these replay the whole ledger (each trade
+        # amortized O(1)). Holdings changed outside the ledger are matched last.
+        book = LotBook(method)
+        self._apply_entries(book, 0, self.count)
+        if holdings is not None:
+            book.reconcile(holdings)
+        return book
+
+    def record(self, op, symbol='', shares=0, value=0.0):
+        # Applied first, so a rejected trade (e.g. a short sale) is never written.
+        result = _apply(self.holdings, op, symbol, shares, value)
+
+        self.last = max(time.time_ns(), self.last)
+        entry = np.array([(self.last, op, self._symbol_id(symbol), shares, value)], dtype=RECORD)
+        with open(self.entries_path, 'ab') as entries_file:
+            entries_file.write(entry.tobytes())
+        self.count += 1
+        if self.count % CHECKPOINT_EVERY == 0:
+            self.checkpoint()
+        return result
+
+    def set(self, symbol, shares, total):
+        self.record(SET, symbol, shares, total)
+
+    def buy(self, symbol, shares, price):
+        self.record(BUY, symbol, shares, price)
+
+    def sell(self, symbol, shares, price):
+        # Returns the gain realized at average cost.
+        return self.record(SELL, symbol, shares, price)
+
+    def delete(self, symbol):
+        self.record(DELETE, symbol)
+
+    def clear(self):
+        self.record(CLEAR)
+
+    def reconcile(self, holdings):
+        # Records the deletes and sets that turn the ledger's holdings into these.
+        for symbol in [symbol for symbol in self.holdings if symbol not in holdings]:
+            self.delete(symbol)
+        for symbol, (count, total) in holdings.items():
+            if symbol not in self.holdings or self.holdings[symbol] != [count, total]:
+                self.set(symbol, count, total)
+
+    def _source_path(self):
+        return os.path.join(self.path, 'source.json')
+
+    def source(self):
+        try:
+            with open(self._source_path(), 'r') as json_file:
+                return json.load(json_file)
+        except (OSError, ValueError):
+            return None
+
+    def mark(self, filename):
+        # Remembers the portfolio file as last seen, so a later hand edit shows up.
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._source_path() + '.tmp'
+        with open(tmp, 'w') as json_file:
+            json.dump(_stamp(filename), json_file)
+        os.replace(tmp, self._source_path())
+
+def open_for(filename, holdings=None):
+    # The ledger next to a portfolio file. The file's holdings, when given,
+    # are authoritative: trades never saved to it, or edits made to it by
+    # hand, are reconciled away so the menu shows what the file holds.
+    # Without them (no file yet) the ledger's replay is used.
+    book = Ledger(ledger_dir(filename))
+    if holdings is not None:
+        book.reconcile(holdings)
+        book.mark(filename)
+    return book
@@ -0,0 +1,134 @@
+#! /usr/bin/python3
+
+from array import array
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+METHODS = ('fifo', 'average')
+# Consumed lots are dropped from the front once they make up half the arrays.
+COMPACT_AFTER = 64
+
+class Lots:
+    # Open lots of one ticker: share counts and prices in two typed arrays,
+    # oldest first from _head. FIFO sells advance _head past emptied lots, so
+    # each lot is consumed once however many sells it takes. Average cost
+    # only needs the pooled shares and cost.
+    __slots__ = ('fifo', 'shares', 'cost', '_sizes', '_prices', '_head')
+
+    def __init__(self, fifo=True):
+        self.fifo = fifo
+        self.shares = 0
+        self.cost = 0.0
+        self._sizes = array('q')
+        self._prices = array('d')
+        self._head = 0
+
+    def buy(self, shares, price):
+        self.shares += shares
+        self.cost += shares * price
+        if self.fifo and shares:
+            self._sizes.append(shares)
+            self._prices.append(price)
+
+    def _consume(self, shares):
+        basis = 0.0
+        head = self._head
+        while shares:
+            size = self._sizes[head]
+            take = min(size, shares)
+            basis += take * self._prices[head]
+            if take == size:
+                head += 1
+            else:
+                self._sizes[head] = size - take
+            shares -= take
+        if head > COMPACT_AFTER and 2 * head > len(self._sizes):
+            del self._sizes[:head]
+            del self._prices[:head]
+            head = 0
+        self._head = head
+        return basis
+
+    def sell(self, shares, price):
+        # Returns the realized gain: proceeds less the cost of the shares sold.
+        if shares == 0:
+            return 0.0
+        if shares > self.shares:
+            raise ValueError('Cannot short stocks.')
+        basis = self._consume(shares) if self.fifo else self.cost * shares / self.shares
+        self.shares -= shares
+        self.cost = self.cost - basis if self.shares else 0.0
+        return shares * price - basis
+
+    def set(self, shares, total):
+        # A position set by hand has no trade history: it becomes a single lot.
+        self.shares = 0
+        self.cost = 0.0
+        self._sizes = array('q')
+        self._prices = array('d')
+        self._head = 0
+        self.buy(shares, total / shares if shares else 0.0)
+        self.cost = total
+
+class LotBook:
+    # Lots per ticker plus the gains realized on each, which outlive the position.
+    def __init__(self, method='fifo'):
+        if method not in METHODS:
+            raise ValueError(f'Unknown lot method {method}, expected one of {", ".join(METHODS)}.')
+        self.method = method
+        self.lots = {}
+        self.realized = {}
+
+    def _lots(self, symbol):
+        lots = self.lots.get(symbol)
+        if lots is None:
+            lots = self.lots[symbol] = Lots(self.method == 'fifo')
+        return lots
+
+    def buy(self, symbol, shares, price):
+        self._lots(symbol).buy(shares, price)
+
+    def sell(self, symbol, shares, price):
+        gain = self.lots[symbol].sell(shares, price)
+        self.realized[symbol] = self.realized.get(symbol, 0.0) + gain
+        return gain
+
+    def set(self, symbol, shares, total):
+        self._lots(symbol).set(shares, total)
+
+    def delete(self, symbol):
+        del self.lots[symbol]
+
+    def clear(self):
+        self.lots.clear()
+
+    def reconcile(self, holdings):
+        # Matches share counts with holdings changed outside the ledger. Only
+        # counts are compared: under FIFO the cost left differs from the
+        # average cost that holdings keep.
+        for symbol in [symbol for symbol in self.lots if symbol not in holdings]:
+            self.delete(symbol)
+        for symbol, (count, total) in holdings.items():
+            if symbol not in self.lots or self.lots[symbol].shares != count:
+                self.set(symbol, count, total)
+
+    def symbols(self):
+        return list(self.lots) + [symbol for symbol in self.realized if symbol not in self.lots]
+
+    def pnl(self, prices):
+        # DataFrame per ticker of open shares, their cost, and realized and
+        # unrealized gains at the given prices (a Series by ticker).
+        symbols = self.symbols()
+        empty = Lots()
+        shares = pd.Series([self.lots.get(symbol, empty).shares for symbol in symbols], index=symbols, dtype=float)
+        cost = pd.Series([self.lots.get(symbol, empty).cost for symbol in symbols], index=symbols, dtype=float)
+        current = pd.Series(prices, dtype=float).reindex(symbols)
+        realized = pd.Series([self.realized.get(symbol, 0.0) for symbol in symbols], index=symbols, dtype=float)
+        value = (current * shares).where(shares > 0, 0.0)
+        unrealized = (value - cost).where(shares > 0, 0.0)
+        return pd.DataFrame({'Shares': shares, 'Cost': cost,
+                             'Avg': (cost / shares).where(shares > 0, 0.0),
+                             'Current': current, 'Value': value,
+                             'Unrealized': unrealized, 'Realized': realized,
+                             'Total': unrealized + realized})
@@ -0,0 +1,175 @@
+#! /usr/bin/python3
+
+import os
+import re
+import json
+import hashlib
+import profiler
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+def period_offset(period):
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if match is None:
+        return None
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        return count
+    elif unit == 'wk':
+        return pd.DateOffset(weeks=count)
+    elif unit == 'mo':
+        return pd.DateOffset(months=count)
+    else:
+        return pd.DateOffset(years=count)
+
+def period_days(period):
+    offset = period_offset(period)
+    if offset is None:
+        return float('inf')
+    if isinstance(offset, int):
+        # Trading days, padded to calendar days for weekends and holidays.
+        return -(-offset * 3 // 2)
+    return (pd.Timestamp('2000-01-01') + offset - pd.Timestamp('2000-01-01')).days
+
+def slice_period(hist, period):
+    offset = period_offset(period)
+    if offset is None or len(hist) == 0:
+        return hist
+    if isinstance(offset, int):
+        return hist.iloc[-offset:]
+    start = hist.index[-1] - offset
+    return hist[hist.index > start]
+
+def _received(data):
+    # Counts one provider request and the in-memory size of what it returned.
+    if profiler.enabled():
+        profiler.count('requests')
+        if hasattr(data, 'memory_usage'):
+            usage = data.memory_usage(deep=True)
+            size = int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        else:
+            size = len(json.dumps(data, default=str)) if data is not None else 0
+        profiler.count('bytes', size)
+    return data
+
+class MarketData:
+    name = 'base'
+    remote = False
+
+    def history(self, symbol, period='1mo', interval='1d', start=None):
+        raise NotImplementedError
+
+    def download(self, symbols, period='1mo', interval='1d'):
+        frames = {symbol: self.history(symbol, period, interval) for symbol in symbols}
+        return pd.concat(frames, axis=1)
+
+    def shares(self, symbol, start='2023-01-01'):
+        raise NotImplementedError
+
+    def info(self, symbol):
+        raise NotImplementedError
+
+class YahooMarketData(MarketData):
+    name = 'yahoo'
+    remote = True
+
+    def history(self, symbol, period='1mo', interval='1d', start=None):
+        import yfinance as yf
+        if start is not None:
+            return _received(yf.Ticker(symbol).history(start=start, interval=interval))
+        return _received(yf.Ticker(symbol).history(period=period, interval=interval))
+
+    def download(self, symbols, period='1mo', interval='1d'):
+        import yfinance as yf
+        tickers = yf.Tickers(' '.join(symbols))
+        return _received(tickers.history(period=period, interval=interval, group_by='ticker', progress=False))
+
+    def shares(self, symbol, start='2023-01-01'):
+        import yfinance as yf
+        return _received(yf.Ticker(symbol).get_shares_full(start=start, end=None))
+
+    def info(self, symbol):
+        import yfinance as yf
+        return _received(yf.Ticker(symbol).info)
+
+class LocalMarketData(MarketData):
+    name = 'local'
+
+    # Fixture layout, CSV or Parquet:
+    #   <directory>/history/<symbol>.csv       daily OHLCV bars indexed by Date
+    #   <directory>/history/<interval>/<symbol>.csv  other intervals
+    #   <directory>/shares/<symbol>.csv        Date, Shares
+    #   <directory>/info.csv                   one row per Symbol, yfinance .info keys
+    def __init__(self, directory):
+        self.directory = directory
+        # The stores and caches are keyed by provider name, so each fixture
+        # directory gets its own and two fixture sets never mix.
+        digest = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:12]
+        self.name = f'local-{digest}'
+        self._frames = {}
+        self._info = None
+
+    def _read(self, *parts):
+        base = os.path.join(self.directory, *parts)
+        if base in self._frames:
+            return self._frames[base]
+
+        frame = None
+        if os.path.isfile(base + '.parquet'):
+            frame = pd.read_parquet(base + '.parquet')
+        elif os.path.isfile(base + '.csv'):
+            frame = pd.read_csv(base + '.csv', index_col=0)
+        if frame is not None and not isinstance(frame.index, pd.DatetimeIndex):
+            frame.index = pd.to_datetime(frame.index)
+        self._frames[base] = frame
+        return frame
+
+    def history(self, symbol, period='1mo', interval='1d', start=None):
+        if interval == '1d':
+            hist = self._read('history', symbol)
+        else:
+            hist = self._read('history', interval, symbol)
+        if hist is None:
+            return _received(pd.DataFrame())
+        if start is not None:
+            return _received(hist[hist.index >= pd.Timestamp(start, tz=hist.index.tz)])
+        return _received(slice_period(hist, period))
+
+    def shares(self, symbol, start='2023-01-01'):
+        shares = self._read('shares', symbol)
+        if shares is None:
+            return _received(None)
+        shares = shares.iloc[:, 0]
+        return _received(shares[shares.index >= pd.Timestamp(start, tz=shares.index.tz)])
+
+    def info(self, symbol):
+        if self._info is None:
+            path = os.path.join(self.directory, 'info.csv')
+            if os.path.isfile(path):
+                self._info = pd.read_csv(path, index_col='Symbol')
+            else:
+                self._info = pd.DataFrame()
+        if symbol in self._info.index:
+            return _received(self._info.loc[symbol].dropna().to_dict())
+        path = os.path.join(self.directory, 'info', symbol + '.json')
+        if os.path.isfile(path):
+            with open(path, 'r') as json_file:
+                return _received(json.load(json_file))
+        return _received({})
+
+_provider = None
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        source = os.environ.get('PORTFOLIO_DATA', 'yahoo')
+        if source == 'yahoo':
+            _provider = YahooMarketData()
+        else:
+            _provider = LocalMarketData(source)
+    return _provider
+
+def set_provider(provider):
+    global _provider
+    _provider = provider
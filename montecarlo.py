@@ -0,0 +1,76 @@
+#! /usr/bin/python3
+
+import concurrent.futures
+import numpy as np
+
+TRADING_DAYS = 252
+CHUNK_PATHS = 10000
+BINS = 4096
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def _edges(log_returns, years):
+    # Histogram range per year: the mean log growth +- 8 standard deviations.
+    days = TRADING_DAYS * np.arange(1, years + 1)
+    center = days * log_returns.mean()
+    half = 8 * np.sqrt(days) * log_returns.std() + 1e-9
+    return center - half, center + half
+
+def _chunk(log_returns, years, paths, seed, low, high, bins):
+    # Simulate one chunk of paths a year at a time; return per-year histograms of the
+    # log growth and the sum of growth factors, so memory does not grow with the paths.
+    rng = np.random.default_rng(seed)
+    growth = np.zeros(paths)
+    counts = np.zeros((years, bins + 2), dtype=np.int64)
+    sums = np.zeros(years)
+    width = (high - low) / bins
+    for year in range(years):
+        draws = rng.integers(0, len(log_returns), size=(paths, TRADING_DAYS))
+        growth += log_returns[draws].sum(axis=1)
+        slot = np.floor((growth - low[year]) / width[year]).astype(np.int64)
+        counts[year] = np.bincount(np.clip(slot, -1, bins) + 1, minlength=bins + 2)
+        sums[year] = np.exp(growth).sum()
+    return counts, sums
+
+def _percentile(counts, low, width, q):
+    cdf = np.cumsum(counts) / counts.sum()
+    slot = int(np.searchsorted(cdf, q / 100))
+    if slot == 0:
+        return low
+    if slot == len(counts) - 1:
+        return low + width * (len(counts) - 2)
+    before = cdf[slot - 1]
+    inside = (q / 100 - before) / (cdf[slot] - before)
+    return low + width * (slot - 1 + inside)
+
+def simulate(returns, start, years=10, paths=100000, seed=None, workers=1,
+             chunk=CHUNK_PATHS, bins=BINS, percentiles=PERCENTILES):
+    # Bootstrap daily returns into yearly value bands. Chunk i always gets the i-th
+    # child of the seed, so results do not depend on the number of workers.
+    log_returns = np.log1p(np.asarray(returns, dtype=np.float64))
+    log_returns = log_returns[np.isfinite(log_returns)]
+    if len(log_returns) == 0:
+        raise ValueError('No returns to sample from.')
+
+    seed = np.random.SeedSequence(seed)
+    low, high = _edges(log_returns, years)
+    sizes = [min(chunk, paths - done) for done in range(0, paths, chunk)]
+    jobs = [(log_returns, years, size, child, low, high, bins)
+            for size, child in zip(sizes, seed.spawn(len(sizes)))]
+
+    if workers == 1:
+        results = [_chunk(*job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_chunk, *zip(*jobs)))
+
+    counts = sum(result[0] for result in results)
+    sums = sum(result[1] for result in results)
+    width = (high - low) / bins
+
+    bands = np.empty((years + 1, len(percentiles)))
+    bands[0] = start
+    for year in range(years):
+        bands[year + 1] = [start * np.exp(_percentile(counts[year], low[year], width[year], q))
+                           for q in percentiles]
+    mean = np.concatenate([[start], start * sums / paths])
+    return {'bands': bands, 'mean': mean, 'percentiles': list(percentiles), 'seed': seed.entropy}
@@ -1,124 +1,73 @@
 #! /usr/bin/python3
 
-import yfinance as yf
+import sys
 import time
 import os
-import json
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-
+import commands
+import profiler
+import stats_engine
+import watch
+import ledger
+import snapshot
+import portfolio_io
+
+@profiler.instrument
 def track_stock_price(stock_dict):
 
-    ibovespa_symbol = "^BVSP"
-    stock = yf.Ticker(ibovespa_symbol)
-    hist = stock.history(period='2d')
-    ibov_var = variation(hist['Close'].iloc[-1], hist['Close'].iloc[0])
-    port_var = 0.0
-    total_inv = 0.0
-
-    print("\n__Stock___|_Current__|__Close___|__Delta1__|_Delta2_|__Beta__|")
-    for stock_symbol, value in stock_dict.items():
-        stock = yf.Ticker(stock_symbol)
-        hist = stock.history(period='2d')
-        current = hist['Close'].iloc[-1]
-        past = hist['Close'].iloc[0]
-        var = variation(current, past)
-        beta = var / ibov_var
-        delta = current - past
-        print(f'{stock_symbol:9} | R$ {current:5.2f} | R$ {past:5.2f} | R$ {delta:5.2f} | {var:5.2f}% | {beta:6.2f} |')
-
-        total_inv += past * value[0]
-        var = current * value[0]
-        var -= past * value[0]
-        port_var += var
+    result = commands.beta(stock_dict)
 
+    print("\n__Stock___|_Current__|__Close___|__Delta1__|_Delta2_|_Beta30_|_Beta90_|Beta252_|")
+    for stock_symbol, row in result['stocks'].iterrows():
+        print(f"{stock_symbol:9} | R$ {row['Current']:5.2f} | R$ {row['Close']:5.2f} | R$ {row['Delta1']:5.2f} | {row['Delta2']:5.2f}% | {row['Beta30']:6.2f} | {row['Beta90']:6.2f} | {row['Beta252']:6.2f} |")
 
     print ('\n- - - - - - - - - - - - - - - - - - - - \n')
 
-    port_var = port_var / total_inv
-    port_var *= 100
-
-    print(f'Portfolio variation: {port_var:.2f}%')
-    print(f'IBOV variation: {ibov_var:.2f}%')
-    print(f'Beta (Port/IBOV): {port_var / ibov_var:.2f}')
-
-def total_invested(stock_dict):
-    total_sum = 0.0
-    for stock, value in stock_dict.items():
-        total_sum += value[1]
-    return round(total_sum, 2)
-
-def calculate_average(stock_qty, volume):
-    if stock_qty > 0:
-        return round(volume/stock_qty, 2)
-    else:
-        return 0.0
+    print(f"Portfolio variation: {result['portfolio_var']:.2f}%")
+    print(f"IBOV variation: {result['ibov_var']:.2f}%")
+    print(f"Portfolio beta vs IBOV: {result['beta']['Beta30']:.2f} (30d) | {result['beta']['Beta90']:.2f} (90d) | {result['beta']['Beta252']:.2f} (252d)")
 
+@profiler.instrument
 def track_portfolio_value(stock_dict):
 
-    total_delta = 0.0
+    result = commands.value(stock_dict)
 
     print("\n__Stock___|___Avg____|_Current__|_Volume(c)__|__Delta1__|__Delta2__|___Delta3___|")
-    for stock, value in stock_dict.items():
-        ticker = yf.Ticker(stock)
-        hist = ticker.history(period='1d')
-        average = calculate_average(value[0], value[1])
-        current = hist['Close'].iloc[0]
-        delta1 = current - average
-
-        if average != 0:
-            delta2 = delta1 / average
-        else:
-            delta2 = 0
-
-        delta2 *= 100
-        delta3 = current * value[0]
-        delta3 -= value[1]
-        current_volume = current * value[0]
-        total_delta += value[0] * current
-        print(f'{stock:9} | R$ {average:5.2f} | R$ {current:5.2f} | R$ {current_volume:8,.2f}| R$ {delta1:5.2f} | {delta2:6.2f}%  | R$ {delta3:7.2f} |')
+    for stock, row in result['stocks'].iterrows():
+        print(f"{stock:9} | R$ {row['Avg']:5.2f} | R$ {row['Current']:5.2f} | R$ {row['Volume']:8,.2f}| R$ {row['Delta1']:5.2f} | {row['Delta2']:6.2f}%  | R$ {row['Delta3']:7.2f} |")
 
     print ('\n- - - - - - - - - - - - - - - - - - - - \n')
 
-    total_inv = total_invested(stock_dict)
-    print(f'Total invested is R$ {total_inv:,.2f}')
-    print(f'Portfolio value is R$ {total_delta:,.2f}')
-
-    total_delta -= total_inv
-    print(f"delta1: R$ {total_delta:.2f}")
-
-    if total_inv > 0:
-        total_delta = total_delta / total_inv
-    else:
-        total_delta = 0
-
-    total_delta *= 100
-    print(f"delta2: {total_delta:.2f}%")
+    print(f"Total invested is R$ {result['invested']:,.2f}")
+    print(f"Portfolio value is R$ {result['value']:,.2f}")
+    print(f"delta1: R$ {result['delta1']:.2f}")
+    print(f"delta2: {result['delta2']:.2f}%")
 
     print ('\n- - - - - - - - - - - - - - - - - - - - \n')
 
 
+@profiler.instrument
 def show_portfolio(stock_dict):
     print("__Stock___|__Qty._|__Volume_____|___Avg____|")
-    for stock, value in stock_dict.items():
-        average = calculate_average(value[0], value[1])
-        print(f'{stock:9} | {value[0]:5} | R$ {value[1]:8,.2f} | R$ {average:5.2f} |')
+    for stock, count, total, average in zip(stock_dict.symbols, stock_dict.shares, stock_dict.totals, stock_dict.averages()):
+        print(f'{stock:9} | {count:5} | R$ {total:8,.2f} | R$ {average:5.2f} |')
 
+@profiler.instrument
 def show_stock_info(stock_dict):
+    result = commands.info(stock_dict)
     print("\n__Stock___|____Shares___|_______Mkt.Cap_______|_Current__|")
-    for stock_symbol in stock_dict.keys():
-        stock = yf.Ticker(stock_symbol)
-        stock_data = stock.history(period='1d')
-        current_price = stock_data["Close"].iloc[0]
-        stock_data = stock.get_shares_full(start="2023-01-01", end=None)
-        shares = stock_data.iloc[-1]
-        market = shares * current_price
-        print(f"{stock_symbol:9} | {shares:11,d} | R$ {market:16,.2f} | R$ {current_price:5.2f} |")
-
-def edit_selection(stock_dict):
+    for stock_symbol, row in result['stocks'].iterrows():
+        print(f"{stock_symbol:9} | {int(row['Shares']):11,d} | R$ {row['MktCap']:16,.2f} | R$ {row['Current']:5.2f} |")
+    if result['failed']:
+        print('\nNo shares for:')
+        for stock_symbol, reason in result['failed'].items():
+            print(f'{stock_symbol:9} | {reason}')
+
+@profiler.instrument
+def edit_selection(book):
+    stock_dict = book.holdings
     while True:
                 os.system('clear')
-                print('new / delete / set / buy / sell / back\n')
+                print('new / delete / set / buy / sell / history / back\n')
                 show_portfolio(stock_dict)
                 option = input('\nInput option: ')
 
@@ -127,7 +76,7 @@ def edit_selection(stock_dict):
                     if stock in stock_dict:
                         option = input(f'Delete {stock}? Y/n: ')
                         if option == "Y" or option == 'y':
-                            del stock_dict[stock]
+                            book.delete(stock)
                             print(f'Deleted stock {stock}')
                     input("\nTo go back to main menu, input 'back'. [Enter]")
 
@@ -138,7 +87,7 @@ def edit_selection(stock_dict):
                         volume = float(input('Input total volume: '))
                         option = input(f'Set {count} {stock} for R$ {volume}? Y/n: ')
                         if option == 'Y' or option == 'y':
-                            stock_dict[stock] = [count, volume]
+                            book.set(stock, count, volume)
                             print(f'Stock {stock} set.')
                     else:
                         print(f'Stock {stock} not found.')
@@ -148,33 +97,24 @@ def edit_selection(stock_dict):
                     stock = input('Input stock ticker to buy: ')
                     buy = int(input("Input quantity to buy: "))
                     price = float(input("Input price per share: "))
-                    volume = buy * price
 
                     option = input(f'Buy {buy} {stock} for R$ {price} each? Y/n: ')
                     if option == 'y' or option == 'Y':
-                        if stock in stock_dict:
-                            value = stock_dict[stock]
-                            buy += value[0]
-                            volume += value[1]
+                        book.buy(stock, buy, price)
                         print(f'Purchased stock {stock}.')
-                        stock_dict[stock] = [buy, volume]
                     input("\nTo go back to main menu, input 'back'. [Enter]")
 
                 elif option == 'sell':
                     stock = input('Input stock ticker to sell: ')
                     sell = int(input("Input quantity to sell: "))
                     price = float(input("Input price per share: "))
-                    volume = sell * price
 
                     option = input(f"Sell {sell} {stock} for R$ {price} each? Y/n: ")
                     if option == 'y' or option == "Y":
                         if stock in stock_dict:
-                            value = stock_dict[stock]
-                            if value[0] >= sell:
-                                sell = value[0] - sell
-                                volume = value[1] - volume
-                                stock_dict[stock] = [sell, volume]
-                                print(f'Sold stock {stock}.')
+                            if stock_dict[stock][0] >= sell:
+                                gain = book.sell(stock, sell, price)
+                                print(f'Sold stock {stock}, realized R$ {gain:,.2f} at average cost.')
                             else:
                                 print("Cannot short stocks.")
 
@@ -183,13 +123,19 @@ def edit_selection(stock_dict):
 
                     input("\nTo go back to main menu, input 'back'. [Enter]")
 
+                elif option == 'history':
+                    day = input('Input date to show holdings as of (YYYY-MM-DD): ')
+                    print()
+                    show_portfolio(book.as_of(day))
+                    input("\nTo go back to main menu, input 'back'. [Enter]")
+
                 elif option == 'back':
                     break
 
                 elif option == 'new':
                     option = input('To create a new stock list you will delete current portfolio.\nContinue? Y/n: ')
                     if option == 'y' or option == 'Y':
-                        stock_dict = {}
+                        book.clear()
                         print('Created empty stock list. To add stocks, select option "buy".')
 
                     input("\nTo go back to main menu, input 'back'. [Enter]")
@@ -197,228 +143,166 @@ def edit_selection(stock_dict):
                 else:
                     continue
 
+@profiler.instrument
 def show_stock_history(stock):
-    ystock = yf.Ticker(stock)
-    hist = ystock.history(period="1mo")
+    hist = commands.history(stock)['days']
     print(f'\n{hist}')
 
-def variation(current, past):
-    data = current - past
-    data = data / past
-    return round(data * 100, 2)
-
+@profiler.instrument
 def portfolio_variation(stock_dict):
+    result = commands.variations(stock_dict)
     print("\n__Stock___|__Current_|___1day__|__7days__|_30days__|__365days_|")
-    for stock_symbol in stock_dict.keys():
-        tmp_list = []
-        ystock = yf.Ticker(stock_symbol)
-        hist = ystock.history(period='1y')
-        current = hist["Close"].iloc[-1]
-        data = hist["Close"].iloc[-2]
-        tmp_list.append(variation(current, data))
-        data = hist["Close"].iloc[-5]
-        tmp_list.append(variation(current, data))
-        data = hist["Close"].iloc[-22]
-        tmp_list.append(variation(current, data))
-        data = hist["Close"].iloc[0]
-        tmp_list.append(variation(current, data))
-
-        print(f"{stock_symbol:9} | R$ {current:5.2f} | {tmp_list[0]:6.2f}% | {tmp_list[1]:6.2f}% | {tmp_list[2]:6.2f}% | {tmp_list[3]:7.2f}% |")
+    for stock_symbol, row in result['stocks'].iterrows():
+        print(f"{stock_symbol:9} | R$ {row['Current']:5.2f} | {row['1day']:6.2f}% | {row['7days']:6.2f}% | {row['30days']:6.2f}% | {row['365days']:7.2f}% |")
 
+@profiler.instrument
 def portfolio_statistics(stock_dict):
-    print("\nData from last 2 months.")
-    print("\n__Stock___|Current(c)_|__Mean(m)__|_Std.Dev__|_c<m__|__(c-m)/s_|")
-    for stock_symbol in stock_dict.keys():
-        ystock = yf.Ticker(stock_symbol)
-        hist = ystock.history(period='2mo')
-        current = hist['Close'].iloc[-1]
-        mean = hist['Close'].iloc[:].mean()
-        sigma = hist['Close'].iloc[:].std()
-        test = current - mean
-        delta = test / sigma
-        delta = delta * 100
-        test = test < 0
-        print(f'{stock_symbol:9} | R$ {current:6.2f} | R$ {mean:6.2f} | R$ {sigma:5.2f} | {test:4} | {delta:7.2f}% |')
-
+    result = commands.stats(stock_dict, stats_engine.WINDOWS)
+    for period, stocks in result.items():
+        print(f"\nData from last {period}.")
+        print("\n__Stock___|Current(c)_|__Mean(m)__|_Std.Dev__|_IBOV_r_|_c<m__|__(c-m)/s_|")
+        for stock_symbol, row in stocks.iterrows():
+            print(f"{stock_symbol:9} | R$ {row['Current']:6.2f} | R$ {row['Mean']:6.2f} | R$ {row['Std']:5.2f} | {row['IBOV Corr']:6.2f} | {row['C<M']:4} | {row['(C-M)/S']:7.2f}% |")
+
+@profiler.instrument
 def portfolio_ratios(stock_dict):
+    result = commands.ratios(stock_dict)
     print("\n__Stock___|_Current__|_EBITDA_|__ROE___|___ROA__|_Cratio|__50dAvg__|_beta__|")
-    for stock_symbol in stock_dict.keys():
-        try:
-            stock_ticker = yf.Ticker(stock_symbol)
-            stock = stock_ticker.info
-            current = stock['currentPrice']
-            ebitda = stock['ebitdaMargins'] * 100
-            roe = stock['returnOnEquity'] * 100
-            roa = stock['returnOnAssets'] * 100
-            cratio = stock['currentRatio']
-            fifty = stock['fiftyDayAverage']
-            beta = stock['beta']
-            print(f'{stock_symbol:9} | R$ {current:5.2f} | {ebitda:5.2f}% | {roe:5.2f}% | {roa:5.2f}% | {cratio:4.2f}x | R$ {fifty:5.2f} | {beta:5.2f} |')
-        except Exception as e:
-            continue
+    for stock_symbol, row in result['stocks'].iterrows():
+        print(f"{stock_symbol:9} | R$ {row['Current']:5.2f} | {row['EBITDA']:5.2f}% | {row['ROE']:5.2f}% | {row['ROA']:5.2f}% | {row['CRatio']:4.2f}x | R$ {row['50dAvg']:5.2f} | {row['Beta']:5.2f} |")
+
+    if result['failed']:
+        print('\nNo ratios for:')
+        for stock_symbol, reason in result['failed'].items():
+            print(f'{stock_symbol:9} | {reason}')
 
+@profiler.instrument
 def portfolio_regression(stock_dict):
 
     p = input('\nInput period, e.g. "3d": ')
-    tickers = ' '.join(stock_dict.keys())
-
-    tickers = yf.Tickers(tickers)
-    hist = tickers.history(period=p)
-    closes = hist['Close']
+    result = commands.trend(stock_dict, p)
 
-    total_inv = total_invested(stock_dict)
-
-    data_dict = {}
-    for index, row in closes.iterrows():
-        portfolio = []
-        for column_name, value in row.items():
-            portfolio.append(round(stock_dict[column_name][0] * value, 2))
-        data_dict[index] = portfolio
-
-    days = 1
-    df = {'Close': []}
     print('Date_______|____value_____|___delta1____|__delta2_|')
-    for key, value in data_dict.items():
-        days += 1
-        sum_items = 0
+    for key, row in result['days'].iterrows():
         date = key.strftime('%Y-%m-%d')
-        for item in value:
-            sum_items += item
-        df['Close'].append(sum_items)
-        delta1 = sum_items - total_inv
-        delta2 = delta1 / total_inv
-        delta2 *= 100
-        print(f'{date} | R$ {sum_items:9,.2f} | R$ {delta1:8,.2f} | {delta2:6.2f}% |')
+        print(f"{date} | R$ {row['Value']:9,.2f} | R$ {row['Delta1']:8,.2f} | {row['Delta2']:6.2f}% |")
 
     print ('\n- - - - - - - - - - - - - - - - - - - - \n')
 
-    df = pd.DataFrame(df)
-    df['Days'] = range(1, days)
-    model = LinearRegression()
-    model.fit(df[['Days']], df['Close'])
-    slope = model.coef_[0]
-    intercept = model.intercept_
-    tomorrow = (slope * float(days)) + intercept
-    print(f"{days}-day Linear Regression for portfolio:")
-    print(f"Slope: R$ {slope:,.2f} / day")
-    print(f"Intercept: R$ {intercept:,.2f}\n")
-    print(f'Forecast tomorrow R$ {tomorrow:,.2f}')
+    print(f"{result['periods']}-day Linear Regression for portfolio:")
+    print(f"Slope: R$ {result['slope']:,.2f} / day")
+    print(f"Intercept: R$ {result['intercept']:,.2f}\n")
+    print(f"Forecast tomorrow R$ {result['forecast']:,.2f}")
+
+    print("\n__Stock___|__Slope/day__|___Forecast____|")
+    for stock, row in result['stocks'].iterrows():
+        print(f"{stock:9} | R$ {row['Slope']:8,.2f} | R$ {row['Forecast']:10,.2f} |")
 
+@profiler.instrument
 def portfolio_time(stock_dict):
     years = int(input('\nInput number of years: '))
     interest = float(input('Input interest rate as a decimal: '))
-    columns = range(years + 1)
-    data = []
-    index = []
-
-    for stock, value in stock_dict.items():
-        data.append(future([], value[1], interest, years))
-        index.append(stock)
-
-    df = pd.DataFrame(data, columns=columns, index=index)
-    df.loc['Total'] = df[:].sum()
+    contribution = input('Input yearly contribution, negative to withdraw [0]: ')
     print()
-    print(df)
-
-def future(alist, present, i, t):
-    alist.append(round(present, 2))
-    if t == 0:
-        return alist
-    else:
-        fv = 1 + i
-        present *= fv
-        return future(alist, present, i, t-1)
+    print(commands.time_value(stock_dict, years, interest, float(contribution) if contribution else 0.0)['stocks'])
 
+@profiler.instrument
 def load_portfolio():
-    file_name = input('To load a portfolio, have your .json in the same path as your script.\nInput file name: ')
+    file_name = input('To load a portfolio, have your .json (or .pfs snapshot) in the same path as your script.\nInput file name: ')
 
     if os.path.isfile(file_name):
-        with open(file_name, 'r') as json_file:
-            stock_dict = json.load(json_file)
+        stock_dict, errors = portfolio_io.load_file(file_name)
         print(f'\nLoaded file "{file_name}".')
-        return stock_dict
+        return ledger.open_for(file_name, stock_dict)
     else:
-        print(f'\nFile "{file_name}" does not exist.\nLoaded empty portfolio')
-        return {}
+        book = ledger.open_for(file_name)
+        if len(book.holdings):
+            print(f'\nFile "{file_name}" does not exist.\nLoaded {len(book.holdings)} stocks from its ledger')
+        else:
+            print(f'\nFile "{file_name}" does not exist.\nLoaded empty portfolio')
+        return book
 
-def save_portfolio(stock_dict):
+@profiler.instrument
+def save_portfolio(book):
     file_name = input('\nInput save as filename: ')
-    if file_name.find('.json') == -1:
+    if not file_name.endswith(('.json', snapshot.EXTENSION)):
         file_name += '.json'
-    with open(file_name, 'w') as json_file:
-        json.dump(stock_dict, json_file)
+    portfolio_io.save_file(file_name, book.holdings)
     print(f'\nSaved file "{file_name}" in current directory.')
+    # Carry on with the saved file's ledger (the same one when saving in place).
+    return ledger.open_for(file_name, book.holdings)
 
-
-def pd2dict_sum(df, stock_dict):
-    data_dict = {}
-    for index, row in df.iterrows():
-        data_dict[index] = 0
-        for column_name, value in row.items():
-            data_dict[index] += stock_dict[column_name][0] * value
-    return data_dict
-
+@profiler.instrument
 def portfolio_reg_candles(stock_dict):
     p = input('\nInput period, e.g. "3d": ')
-    tickers = ' '.join(stock_dict.keys())
+    result = commands.candles(stock_dict, p)
 
-    tickers = yf.Tickers(tickers)
-    hist = tickers.history(period=p)
+    df = result['days']
+    df.index = df.index.strftime('%Y-%m-%d')
+    print(df)
 
-    closes_dict = pd2dict_sum(hist['Close'], stock_dict)
-    highs_dict = pd2dict_sum(hist['High'], stock_dict)
-    lows_dict = pd2dict_sum(hist['Low'], stock_dict)
+    print(f"\n{result['periods']}-day Linear Regression for portfolio:")
+    for category, row in result['forecast'].iterrows():
+        print(f"{category} forecast tomorrow R$ {row['Forecast']:,.2f} | Slope R$/day {row['Slope']:.2f} | Intercept R$ {row['Intercept']:,.2f}")
 
-    data_dict = {}
-    days = 1
-    for key, value in closes_dict.items():
-        date = key.strftime('%Y-%m-%d')
-        data_dict[date] = [round(value, 2),
-                           round(highs_dict[key], 2),
-                           round(lows_dict[key], 2),
-                           round(highs_dict[key] - lows_dict[key], 2)]
-        days += 1
+@profiler.instrument
+def portfolio_sharpe(stock_dict):
 
-    df = pd.DataFrame(data_dict).transpose()
+    risk_free = float(input('\nInput period annual risk-free rate: '))
+    result = commands.sharpe(stock_dict, risk_free)
+
+    print(f"\nStd Daily: {result['std_daily'] * 100:.2f}% | R$ {result['std_value']:.2f} |")
+    print(f"Mean Daily: {result['mean_daily'] * 100:.2f}% | R$ {result['mean_value']:,.2f} | ")
+    print(f"Risk-free: {result['risk_free'] * 100:.2f}%")
+    print(f"\nSharpe Ratio: {result['sharpe']:.2f}")
+    print(f"Sharpe Annual: {result['sharpe_annual']:.2f}")
+
+@profiler.instrument
+def portfolio_risk(stock_dict):
+    result = commands.risk(stock_dict)
+    print(f"\nRisk from {result['days']} daily returns (covariance shrinkage {result['shrinkage']:.2f})")
+    print("\n__Stock___|_Weight_|_Vol(y)_|_Contrib_|_Share__|")
+    for stock_symbol, row in result['stocks'].iterrows():
+        print(f"{stock_symbol:9} | {row['Weight']:5.2f}% | {row['Vol']:5.2f}% | {row['Contribution']:6.2f}% | {row['Share']:5.2f}% |")
 
-    columns = ['Close', 'High', 'Low', 'Range']
-    df.columns = columns
+    print ('\n- - - - - - - - - - - - - - - - - - - - \n')
 
-    print(df)
+    print(f"Portfolio value is R$ {result['value']:,.2f}")
+    print(f"Volatility: {result['volatility_daily']:.2f}% daily | {result['volatility_annual']:.2f}% annual")
+    print(f"1-day VaR {result['confidence'] * 100:.0f}%: R$ {result['var_parametric']:,.2f} parametric | R$ {result['var_historical']:,.2f} historical")
+    print(f"1-day CVaR {result['confidence'] * 100:.0f}%: R$ {result['cvar_parametric']:,.2f} parametric | R$ {result['cvar_historical']:,.2f} historical")
 
-    print(f"\n{days}-day Linear Regression for portfolio:")
-    df['Days'] = range(1, days)
+@profiler.instrument
+def portfolio_pnl(book):
+    method = input('\nInput lot method, fifo or average [fifo]: ') or 'fifo'
+    result = commands.pnl(book.lots(method))
+    print(f"\nProfit and loss by {result['method']} lots")
+    print("\n__Stock___|__Qty._|_____Cost______|_Current__|___Unrealized___|____Realized____|")
+    for stock_symbol, row in result['stocks'].iterrows():
+        print(f"{stock_symbol:9} | {int(row['Shares']):5d} | R$ {row['Cost']:10,.2f} | R$ {row['Current']:5.2f} | R$ {row['Unrealized']:11,.2f} | R$ {row['Realized']:11,.2f} |")
 
-    for category in columns[:-1]:
-        model = LinearRegression()
-        model.fit(df[['Days']], df[category])
-        slope = model.coef_[0]
-        intercept = model.intercept_
-        tomorrow = (slope * float(days)) + intercept
-        print(f'{category} forecast tomorrow R$ {tomorrow:,.2f} | Slope R$/day {slope:.2f} | Intercept R$ {intercept:,.2f}')
+    print ('\n- - - - - - - - - - - - - - - - - - - - \n')
 
-def portfolio_sharpe(stock_dict):
+    print(f"Cost of open lots R$ {result['cost']:,.2f} | Value R$ {result['value']:,.2f}")
+    print(f"Unrealized R$ {result['unrealized']:,.2f} | Realized R$ {result['realized']:,.2f} | Total R$ {result['total']:,.2f}")
 
-    risk_free = float(input('\nInput period annual risk-free rate: '))
-    tickers = ' '.join(stock_dict.keys())
-    tickers = yf.Tickers(tickers)
-    hist = tickers.history(period='1y')
-
-    data_series = pd.Series(pd2dict_sum(hist['Close'], stock_dict).values())
-    mean_data = data_series.mean()
-    std_data = data_series.std()
-
-    var_change = data_series.pct_change()
-    std_daily = float(var_change.std())
-    mean_daily = float(var_change.mean())
-    sharpe = (mean_daily - risk_free) / std_daily
-
-    print(f'\nStd Daily: {std_daily * 100:.2f}% | R$ {std_data:.2f} |')
-    print(f'Mean Daily: {mean_daily * 100:.2f}% | R$ {mean_data:,.2f} | ')
-    print(f'Risk-free: {risk_free * 100:.2f}%')
-    print(f'\nSharpe Ratio: {sharpe:.2f}')
-    sharpe_annual = sharpe * (252**0.5)
-    print(f'Sharpe Annual: {sharpe_annual:.2f}')
+@profiler.instrument
+def portfolio_monte_carlo(stock_dict):
+    years = int(input('\nInput number of years: '))
+    paths = input('Input number of paths [100000]: ')
+    result = commands.monte_carlo(stock_dict, years, int(paths) if paths else 100000, workers=os.cpu_count())
+
+    print(f"\nBootstrapped {result['paths']:,} paths from {result['days']} daily returns (seed {result['seed']})")
+    print(f"Current value R$ {result['start']:,.2f}\n")
+    print(result['bands'])
+
+@profiler.instrument
+def watch_portfolio(stock_dict):
+    interval = input('\nInput refresh interval in seconds [30]: ')
+    try:
+        watch.watch(stock_dict, float(interval) if interval else 30.0)
+    except KeyboardInterrupt:
+        pass
 
 def welcome():
     print("Track Beta value \t\t\tinput 'beta' or 'b'")
@@ -427,11 +311,15 @@ def welcome():
     print("Show portfolio \t\t\t\tinput 'show' or 'h'")
     print("Portfolio market capitalization info \tinput 'info' or 'i'")
     print("Portfolio Sharpe ratio\t\t\tinput 'sharpe' or 'j'")
+    print("Portfolio risk and VaR\t\t\tinput 'risk' or 'x'")
     print("Portfolio future value\t\t\tinput 'time' or 'm'")
+    print("Portfolio Monte Carlo projection\tinput 'mc' or 'k'")
+    print("Portfolio profit and loss\t\tinput 'pnl' or 'f'")
     print("Track portfolio value \t\t\tinput 'portfolio' or 'p'")
     print("Track stocks ratio \t\t\tinput 'ratio' or 'r'")
     print("Track portfolio statistics \t\tinput 'stats' or 't'")
     print("Track portfolio variation \t\tinput 'variation' or 'v'")
+    print("Watch beta and value live \t\tinput 'watch' or 'w'")
     print()
     print("To lookup a stock 1mo history\t\tinput 'history' or 'o'")
     print()
@@ -443,8 +331,13 @@ def welcome():
 
 if __name__ == "__main__":
 
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
     option = 'a'
-    stock_dict = load_portfolio()
+    book = load_portfolio()
+    stock_dict = book.holdings
     input('\nPress [Enter]')
 
     while option != 'exit':
@@ -462,6 +355,14 @@ if __name__ == "__main__":
                 portfolio_time(stock_dict)
                 input('\nPress [Enter]')
 
+            elif option == 'mc' or option == 'k':
+                portfolio_monte_carlo(stock_dict)
+                input('\nPress [Enter]')
+
+            elif option == 'pnl' or option == 'f':
+                portfolio_pnl(book)
+                input('\nPress [Enter]')
+
             elif option == 'candles' or option == 'c':
                 portfolio_reg_candles(stock_dict)
                 input('\nPress [Enter]')
@@ -478,6 +379,14 @@ if __name__ == "__main__":
                 portfolio_ratios(stock_dict)
                 input('\nPress [Enter]')
 
+            elif option == 'watch' or option == 'w':
+                watch_portfolio(stock_dict)
+                input('\nPress [Enter]')
+
+            elif option == 'risk' or option == 'x':
+                portfolio_risk(stock_dict)
+                input('\nPress [Enter]')
+
             elif option == 'sharpe' or option == 'j':
                 portfolio_sharpe(stock_dict)
                 input('\nPress [Enter]')
@@ -509,15 +418,17 @@ if __name__ == "__main__":
                 input('\nPress [Enter]')
 
             elif option == 'load' or option == 'l':
-                stock_dict = load_portfolio()
+                book = load_portfolio()
+                stock_dict = book.holdings
                 input('\nPress [Enter]')
 
             elif option == 'save' or option == 's':
-                save_portfolio(stock_dict)
+                book = save_portfolio(book)
+                stock_dict = book.holdings
                 input('\nPress [Enter]')
 
             elif option == 'edit' or option == 'e':
-                edit_selection(stock_dict)
+                edit_selection(book)
 
             else:
                 input("\nIncorrect option. [Enter]")
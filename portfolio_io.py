@@ -0,0 +1,169 @@
+#! /usr/bin/python3
+
+import os
+import sys
+import csv
+import json
+import math
+import argparse
+import numpy as np
+import atomic
+import snapshot
+from holdings import Holdings
+
+CHUNK_ROWS = 8192
+
+def _parse_row(row):
+    if len(row) < 3:
+        raise ValueError('expected Stock, Shares, Volume')
+    symbol = row[0].strip()
+    if not symbol:
+        raise ValueError('empty ticker')
+    shares = int(row[1])
+    if shares < 0:
+        raise ValueError(f'negative share count {shares}')
+    total = float(row[2])
+    if not math.isfinite(total):
+        raise ValueError(f'invalid volume {row[2]}')
+    return symbol, shares, total
+
+def _parse_chunk(lines, rows):
+    # Fast path: convert the whole chunk at once; fall back per row to find the bad lines.
+    try:
+        symbols = [row[0].strip() for row in rows]
+        shares = np.array([row[1] for row in rows], dtype=np.int64)
+        totals = np.array([row[2] for row in rows], dtype=np.float64)
+        if all(symbols) and (shares >= 0).all() and np.isfinite(totals).all():
+            return symbols, shares, totals, []
+    except (ValueError, IndexError):
+        pass
+
+    symbols, shares, totals, errors = [], [], [], []
+    for line, row in zip(lines, rows):
+        try:
+            symbol, count, total = _parse_row(row)
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        symbols.append(symbol)
+        shares.append(count)
+        totals.append(total)
+    return symbols, np.array(shares, dtype=np.int64), np.array(totals, dtype=np.float64), errors
+
+def iter_csv_chunks(filename, chunk_rows=CHUNK_ROWS):
+    with open(filename, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        lines, rows = [], []
+        for row in reader:
+            if not row:
+                continue
+            lines.append(reader.line_num)
+            rows.append(row)
+            if len(rows) == chunk_rows:
+                yield _parse_chunk(lines, rows)
+                lines, rows = [], []
+        if rows:
+            yield _parse_chunk(lines, rows)
+
+def sidecar_name(filename):
+    return filename + '.npz'
+
+def _source_stamp(filename):
+    stat = os.stat(filename)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+def write_sidecar(filename, holdings):
+    path = sidecar_name(filename)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp,
+             symbols=np.array(holdings.symbols, dtype=str),
+             shares=holdings.shares,
+             totals=holdings.totals,
+             source=_source_stamp(filename))
+    os.replace(tmp, path)
+
+def read_sidecar(filename):
+    path = sidecar_name(filename)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if not np.array_equal(data['source'], _source_stamp(filename)):
+                return None
+            return Holdings.from_arrays(data['symbols'], data['shares'], data['totals'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def load_csv(filename, chunk_rows=CHUNK_ROWS, sidecar=True):
+    if sidecar:
+        holdings = read_sidecar(filename)
+        if holdings is not None:
+            return holdings, []
+
+    symbols, shares, totals, errors = [], [], [], []
+    for chunk_symbols, chunk_shares, chunk_totals, chunk_errors in iter_csv_chunks(filename, chunk_rows):
+        symbols.extend(chunk_symbols)
+        shares.append(chunk_shares)
+        totals.append(chunk_totals)
+        errors.extend(chunk_errors)
+
+    if symbols:
+        holdings = Holdings.from_arrays(symbols, np.concatenate(shares), np.concatenate(totals))
+    else:
+        holdings = Holdings()
+
+    # Only cache clean files, so bad rows keep being reported until fixed.
+    if sidecar and not errors:
+        try:
+            write_sidecar(filename, holdings)
+        except OSError:
+            pass
+    return holdings, errors
+
+def load_file(filename):
+    if filename.endswith(snapshot.EXTENSION):
+        return snapshot.read(filename), []
+    if filename.endswith('.json'):
+        with open(filename, 'r') as json_file:
+            return Holdings.from_dict(json.load(json_file)), []
+    return load_csv(filename)
+
+def save_json(filename, holdings):
+    def write(json_file):
+        json.dump(holdings.to_dict(), json_file)
+    atomic.replace_file(filename, write)
+
+def save_csv(filename, holdings):
+    def write(csvfile):
+        writer = csv.writer(csvfile)
+        writer.writerow(['Stock', 'Count', 'Volume'])
+        writer.writerows([key] + value for key, value in holdings.items())
+    atomic.replace_file(filename, write, newline='')
+    write_sidecar(filename, holdings)
+
+def save_file(filename, holdings):
+    if filename.endswith(snapshot.EXTENSION):
+        snapshot.write(filename, holdings)
+    elif filename.endswith('.json'):
+        save_json(filename, holdings)
+    else:
+        save_csv(filename, holdings)
+
+def convert(source, target):
+    # Between snapshots and the JSON and CSV formats, by extension.
+    holdings, errors = load_file(source)
+    save_file(target, holdings)
+    return errors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert portfolios between .json, .csv and .pfs snapshots.')
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args(argv)
+    for line, message in convert(args.source, args.target):
+        print(f'Skipped line {line}: {message}', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#! /usr/bin/python3
+
+import os
+import sys
+import json
+import time
+import atexit
+import builtins
+import datetime
+import functools
+import threading
+import contextlib
+import tracemalloc
+import multiprocessing
+
+# PORTFOLIO_PROFILE=1 turns profiling on; any other value names the JSON trace.
+# Spans record wall time, market data requests and the bytes they returned,
+# cache hits and misses, and the peak of Python allocations above the start
+# (traced with tracemalloc, which slows allocation-heavy code while on).
+TRACE_DIR = os.environ.get('PORTFOLIO_PROFILE_DIR', os.path.join('.cache', 'profile'))
+COUNTERS = ('requests', 'bytes', 'cache_hits', 'cache_misses')
+
+_enabled = False
+_report = False
+_trace = None
+_lock = threading.Lock()
+_counts = dict.fromkeys(COUNTERS, 0)
+_stack = []
+_spans = []
+_input = builtins.input
+
+def enabled():
+    return _enabled
+
+def enable(trace=None, report=True):
+    # report=False collects spans without printing or writing a trace, for
+    # worker processes that hand their spans back to the parent.
+    global _enabled, _report, _trace
+    _trace = trace or _trace
+    _report = report and multiprocessing.parent_process() is None
+    if _enabled:
+        return
+    _enabled = True
+    tracemalloc.start()
+    # Time spent waiting at a prompt is not the action's time.
+    builtins.input = _timed_input
+    atexit.register(finish)
+
+def _timed_input(prompt=''):
+    start = time.perf_counter()
+    try:
+        return _input(prompt)
+    finally:
+        waited = time.perf_counter() - start
+        for frame in _stack:
+            frame['idle'] += waited
+
+def count(name, amount=1):
+    if _enabled:
+        with _lock:
+            _counts[name] += amount
+
+def cache(hits=0, misses=0):
+    if _enabled:
+        with _lock:
+            _counts['cache_hits'] += hits
+            _counts['cache_misses'] += misses
+
+def _begin(name):
+    current, peak = tracemalloc.get_traced_memory()
+    # Fold the running peak into the enclosing span before it is reset.
+    if _stack:
+        _stack[-1]['peak'] = max(_stack[-1]['peak'], peak)
+    tracemalloc.reset_peak()
+    frame = {'name': name, 'depth': len(_stack), 'started': time.time(), 'clock': time.perf_counter(),
+             'idle': 0.0, 'counts': dict(_counts), 'base': current, 'peak': current}
+    _stack.append(frame)
+    return frame
+
+def _end(frame, seconds=None):
+    _stack.remove(frame)
+    peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+    if _stack:
+        _stack[-1]['peak'] = max(_stack[-1]['peak'], peak)
+    if seconds is None:
+        seconds = time.perf_counter() - frame['clock'] - frame['idle']
+    record = {'name': frame['name'], 'depth': frame['depth'],
+              'started': datetime.datetime.fromtimestamp(frame['started']).isoformat(timespec='milliseconds'),
+              'seconds': seconds}
+    record.update({name: _counts[name] - frame['counts'][name] for name in COUNTERS})
+    record['peak_bytes'] = peak - frame['base']
+    _spans.append(record)
+    if _report and frame['depth'] == 0:
+        print(_line(record), file=sys.stderr)
+
+@contextlib.contextmanager
+def span(name):
+    if not _enabled:
+        yield
+        return
+    frame = _begin(name)
+    try:
+        yield
+    finally:
+        _end(frame)
+
+def instrument(func):
+    # Runs the function inside a span named after it.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with span(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def measure_rows(name, rows):
+    # A span over a row generator: only the time spent producing rows counts,
+    # not what the consumer does between them.
+    if not _enabled:
+        return rows
+    return _measured_rows(name, rows)
+
+def _measured_rows(name, rows):
+    frame = None
+    spent = 0.0
+    rows = iter(rows)
+    try:
+        while True:
+            start = time.perf_counter()
+            if frame is None:
+                frame = _begin(name)
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - start
+            yield row
+    finally:
+        if frame is not None:
+            _end(frame, spent)
+
+def spans():
+    return list(_spans)
+
+def extend(records):
+    # Spans recorded in a worker process.
+    _spans.extend(records)
+    if _report:
+        for record in records:
+            if record['depth'] == 0:
+                print(_line(record), file=sys.stderr)
+
+def _line(record):
+    return (f"[profile] {record['name']}: {record['seconds']:.3f}s | {record['requests']} requests "
+            f"| {record['bytes'] / 1024:,.0f} KB | cache {record['cache_hits']} hits, {record['cache_misses']} misses "
+            f"| peak {record['peak_bytes'] / 2**20:,.1f} MB")
+
+def summary(records):
+    # Totals per span name, in order of first appearance.
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record['name'], dict.fromkeys(('calls', 'seconds', *COUNTERS, 'peak_bytes'), 0))
+        total['calls'] += 1
+        total['seconds'] += record['seconds']
+        for name in COUNTERS:
+            total[name] += record[name]
+        total['peak_bytes'] = max(total['peak_bytes'], record['peak_bytes'])
+    return totals
+
+def print_summary(records, out=sys.stderr):
+    print('\n__Span______________________|_Calls_|_Seconds_|_Requests_|_____KB_|_Hits_|_Misses_|_Peak MB_|', file=out)
+    for name, total in summary(records).items():
+        print(f"{name[:27]:27} | {total['calls']:5d} | {total['seconds']:7.3f} | {total['requests']:8d} "
+              f"| {total['bytes'] / 1024:6,.0f} | {total['cache_hits']:4d} | {total['cache_misses']:6d} "
+              f"| {total['peak_bytes'] / 2**20:7.1f} |", file=out)
+
+def trace_path():
+    if _trace:
+        return _trace
+    script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+    return os.path.join(TRACE_DIR, f"{script}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+def finish():
+    if not _report or not _spans:
+        return
+    print_summary(_spans)
+    path = trace_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as json_file:
+        json.dump({'argv': sys.argv, 'spans': _spans, 'totals': summary(_spans)}, json_file, indent=2)
+    print(f'Profile trace written to {path}', file=sys.stderr)
+
+_setting = os.environ.get('PORTFOLIO_PROFILE', '')
+if _setting not in ('', '0'):
+    enable(None if _setting == '1' else _setting)
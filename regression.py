@@ -0,0 +1,33 @@
+#! /usr/bin/python3
+
+import numpy as np
+
+# Least-squares trend lines y = slope * x + intercept with x = 1, 2, ..., n,
+# fitted column by column so many series can share one pass.
+
+def _solve(count, sx, sy, sxx, sxy):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = count * sxx - sx * sx
+        slope = np.where(denom != 0, (count * sxy - sx * sy) / denom, np.nan)
+        intercept = (sy - slope * sx) / count
+    return slope, intercept
+
+def fit_trend(values):
+    y = np.asarray(values, dtype=float)
+    single = y.ndim == 1
+    if single:
+        y = y[:, None]
+
+    # Missing points are left out of their own column only.
+    mask = np.isfinite(y)
+    y = np.where(mask, y, 0.0)
+    x = np.arange(1, len(y) + 1, dtype=float)[:, None] * mask
+
+    slope, intercept = _solve(mask.sum(axis=0), x.sum(axis=0), y.sum(axis=0),
+                              (x * x).sum(axis=0), (x * y).sum(axis=0))
+    if single:
+        return float(slope[0]), float(intercept[0])
+    return slope, intercept
+
+def forecast(slope, intercept, x):
+    return slope * x + intercept
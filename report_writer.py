@@ -0,0 +1,164 @@
+#! /usr/bin/python3
+
+import os
+import csv
+import math
+import shutil
+from lazy import lazy_import
+
+pe = lazy_import('pyexcel')
+
+PARQUET_BATCH = 4096
+
+class ReportWriter:
+    # sheet() takes any iterable of rows and writes them as they are produced.
+    # Output goes to a temporary name and replaces the target only on success.
+    extension = ''
+
+    def __init__(self, path):
+        self.target = path
+        base, extension = os.path.splitext(path) if self.extension else (path, '')
+        self.path = base + '.tmp' + extension
+
+    def sheet(self, name, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def close(self):
+        self.finish()
+        os.replace(self.path, self.target)
+
+    def abort(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.abort()
+            return
+        try:
+            self.close()
+        except BaseException:
+            # Lazy sheets (ODS) only run their builders while closing.
+            self.abort()
+            raise
+
+class OdsWriter(ReportWriter):
+    # pyexcel pulls every sheet's rows while it writes the book in finish().
+    extension = '.ods'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.book = {}
+
+    def sheet(self, name, rows):
+        self.book[name] = rows
+
+    def finish(self):
+        pe.isave_book_as(bookdict=self.book, dest_file_name=self.path)
+
+class XlsxWriter(ReportWriter):
+    extension = '.xlsx'
+
+    def __init__(self, path):
+        super().__init__(path)
+        from openpyxl import Workbook
+        self.workbook = Workbook(write_only=True)
+
+    def sheet(self, name, rows):
+        worksheet = self.workbook.create_sheet(name)
+        for row in rows:
+            worksheet.append(row)
+
+    def finish(self):
+        self.workbook.save(self.path)
+
+class CsvBundleWriter(ReportWriter):
+    # One <sheet>.csv per sheet inside the directory at path. The marker file
+    # tells a bundle written here from a directory of the user's, which is
+    # never replaced.
+    extension = ''
+    MARKER = '.report_bundle'
+
+    def __init__(self, path):
+        super().__init__(path)
+        for path in (self.target, self.path):
+            if os.path.exists(path) and not self._is_bundle(path):
+                raise FileExistsError(f'{path} exists and is not a report bundle; not replacing it')
+        if os.path.exists(self.path):
+            # Left over from an interrupted run.
+            shutil.rmtree(self.path)
+        os.makedirs(self.path)
+        open(os.path.join(self.path, self.MARKER), 'w').close()
+
+    def _is_bundle(self, path):
+        return os.path.isfile(os.path.join(path, self.MARKER))
+
+    def sheet(self, name, rows):
+        with open(os.path.join(self.path, name + '.csv'), 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            for row in rows:
+                writer.writerow(row)
+
+    def close(self):
+        # Checked again in case the target appeared while the sheets were written.
+        if os.path.exists(self.target):
+            if not self._is_bundle(self.target):
+                raise FileExistsError(f'{self.target} exists and is not a report bundle; not replacing it')
+            shutil.rmtree(self.target)
+        os.replace(self.path, self.target)
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return None
+    return str(value)
+
+class ParquetWriter(ReportWriter):
+    # Sheets are ragged and mixed-type, so each row is stored as
+    # (sheet, row, cells: list<string>) in a single file, in batches.
+    extension = '.parquet'
+
+    def __init__(self, path):
+        super().__init__(path)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([('sheet', pa.string()), ('row', pa.int64()), ('cells', pa.list_(pa.string()))])
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+
+    def _flush(self, name, start, cells):
+        if cells:
+            self.writer.write_table(self.pa.table({'sheet': [name] * len(cells),
+                                                   'row': list(range(start, start + len(cells))),
+                                                   'cells': cells}, schema=self.schema))
+
+    def sheet(self, name, rows):
+        start, cells = 0, []
+        for row in rows:
+            cells.append([_cell(value) for value in row])
+            if len(cells) == PARQUET_BATCH:
+                self._flush(name, start, cells)
+                start, cells = start + len(cells), []
+        self._flush(name, start, cells)
+
+    def finish(self):
+        self.writer.close()
+
+    def abort(self):
+        self.writer.close()
+        super().abort()
+
+FORMATS = {'ods': OdsWriter, 'xlsx': XlsxWriter, 'csv': CsvBundleWriter, 'parquet': ParquetWriter}
+
+def output_path(base, fmt):
+    return base + FORMATS[fmt].extension
+
+def open_writer(base, fmt='ods'):
+    return FORMATS[fmt](output_path(base, fmt))
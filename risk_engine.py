@@ -0,0 +1,101 @@
+#! /usr/bin/python3
+
+from statistics import NormalDist
+import numpy as np
+
+TRADING_DAYS = 252
+
+class Covariance:
+    # Running mean and co-moment matrix of return rows. Adding or removing k rows
+    # costs O(k * n**2), so a sliding window never needs a full recompute.
+    __slots__ = ('count', 'mean', 'comoment')
+
+    def __init__(self, width):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.comoment = np.zeros((width, width))
+
+    @classmethod
+    def from_returns(cls, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        cov = cls(rows.shape[1])
+        cov.add(rows)
+        return cov
+
+    def add(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        count = len(rows)
+        if count == 0:
+            return
+        mean = rows.mean(axis=0)
+        centered = rows - mean
+        total = self.count + count
+        delta = mean - self.mean
+        self.comoment += centered.T @ centered + np.outer(delta, delta) * (self.count * count / total)
+        self.mean += delta * (count / total)
+        self.count = total
+
+    def remove(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        count = len(rows)
+        if count == 0:
+            return
+        if count >= self.count:
+            self.__init__(len(self.mean))
+            return
+        mean = rows.mean(axis=0)
+        centered = rows - mean
+        rest = self.count - count
+        rest_mean = (self.count * self.mean - count * mean) / rest
+        delta = mean - rest_mean
+        self.comoment -= centered.T @ centered + np.outer(delta, delta) * (rest * count / self.count)
+        self.mean = rest_mean
+        self.count = rest
+
+    def matrix(self, shrinkage=None):
+        # Sample covariance; shrinkage is None, 'oas' or an intensity in [0, 1]
+        # towards the scaled identity. Returns (matrix, intensity used).
+        if self.count < 2:
+            raise ValueError('Need at least two days of returns.')
+        sample = self.comoment / (self.count - 1)
+        if shrinkage is None:
+            return sample, 0.0
+
+        width = len(sample)
+        if shrinkage == 'oas':
+            # Oracle approximating shrinkage (Chen et al. 2010), on the biased estimate.
+            biased = self.comoment / self.count
+            mu = np.trace(biased) / width
+            alpha = np.mean(biased ** 2)
+            den = (self.count + 1) * (alpha - mu ** 2 / width)
+            shrinkage = 1.0 if den == 0 else min((alpha + mu ** 2) / den, 1.0)
+        shrinkage = float(shrinkage)
+        target = np.trace(sample) / width
+        shrunk = (1 - shrinkage) * sample
+        shrunk.flat[::width + 1] += shrinkage * target
+        return shrunk, shrinkage
+
+def returns_matrix(closes):
+    # Daily returns of the forward-filled closes; a ticker with no quote yet counts as flat.
+    returns = closes.ffill().pct_change().iloc[1:]
+    return returns.fillna(0.0)
+
+def measures(cov, returns, weights, value, confidence=0.95):
+    # One-day risk of a position vector given its covariance matrix and return history.
+    mean = returns.mean(axis=0) @ weights
+    marginal = cov @ weights
+    volatility = float(np.sqrt(weights @ marginal))
+    contribution = weights * marginal / volatility if volatility > 0 else np.zeros_like(weights)
+
+    z = NormalDist().inv_cdf(confidence)
+    var_parametric = -(mean - z * volatility) * value
+    cvar_parametric = -(mean - volatility * NormalDist().pdf(z) / (1 - confidence)) * value
+
+    history = np.sort(returns @ weights)
+    cut = max(int(np.floor(len(history) * (1 - confidence))), 1)
+    var_historical = -float(np.quantile(history, 1 - confidence)) * value
+    cvar_historical = -float(history[:cut].mean()) * value
+
+    return {'volatility': volatility, 'contribution': contribution,
+            'var_parametric': float(var_parametric), 'cvar_parametric': float(cvar_parametric),
+            'var_historical': var_historical, 'cvar_historical': cvar_historical}
@@ -0,0 +1,147 @@
+#! /usr/bin/python3
+
+import os
+import time
+import concurrent.futures
+import profiler
+import market_data
+from market_data import period_offset
+from lazy import lazy_import, resolve
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+STORE_DIR = os.environ.get('PORTFOLIO_SERIES_DIR', os.path.join('.cache', 'series'))
+SYNC_TTL = float(os.environ.get('PORTFOLIO_SYNC_TTL', 15 * 60))
+FIRST_PERIOD = '5y'
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Layout: <STORE_DIR>/<provider>/<ticker>/<column>.bin, one raw little-endian
+# array per column. Date holds int64 nanoseconds of the (naive) bar date, the
+# rest float64. Date is written last, so its length is the committed row count.
+_maps = {}
+# Batch worker processes only read the store their parent synced: left to
+# sync on their own they would each hit the network once SYNC_TTL passed,
+# and rewrite columns that other workers have mapped.
+_read_only = False
+
+def read_only():
+    global _read_only
+    _read_only = True
+
+def _dir(ticker):
+    return os.path.join(STORE_DIR, market_data.get_provider().name, ticker)
+
+def _path(ticker, column):
+    return os.path.join(_dir(ticker), column + '.bin')
+
+def _rows(ticker):
+    try:
+        return os.path.getsize(_path(ticker, 'Date')) // 8
+    except OSError:
+        return 0
+
+def columns(ticker):
+    # Read-only memory maps of every column, trimmed to the committed rows.
+    key = (market_data.get_provider().name, ticker)
+    count = _rows(ticker)
+    cached = _maps.get(key)
+    if cached is not None and len(cached['Date']) == count:
+        return cached
+
+    if count == 0:
+        maps = {'Date': np.empty(0, dtype='<i8')}
+        maps.update({field: np.empty(0, dtype='<f8') for field in FIELDS})
+    else:
+        maps = {'Date': np.memmap(_path(ticker, 'Date'), dtype='<i8', mode='r', shape=(count,))}
+        maps.update({field: np.memmap(_path(ticker, field), dtype='<f8', mode='r', shape=(count,))
+                     for field in FIELDS})
+    _maps[key] = maps
+    return maps
+
+def _write_column(path, keep, itemsize, data):
+    # Drop anything past the rows we keep (a replaced bar or a torn write), then append.
+    mode = 'r+b' if os.path.exists(path) else 'w+b'
+    with open(path, mode) as column_file:
+        column_file.truncate(keep * itemsize)
+        column_file.seek(keep * itemsize)
+        column_file.write(data.tobytes())
+
+def _append(ticker, hist):
+    index = hist.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    dates = index.normalize().to_numpy(dtype='datetime64[ns]').astype('<i8')
+    values = hist.reindex(columns=FIELDS).to_numpy(dtype='<f8')
+
+    stored = columns(ticker)['Date']
+    keep = int(np.searchsorted(stored, dates[0], side='left')) if len(dates) else len(stored)
+    _maps.pop((market_data.get_provider().name, ticker), None)
+
+    os.makedirs(_dir(ticker), exist_ok=True)
+    for i, field in enumerate(FIELDS):
+        _write_column(_path(ticker, field), keep, 8, np.ascontiguousarray(values[:, i]))
+    _write_column(_path(ticker, 'Date'), keep, 8, dates)
+
+def _stale(ticker):
+    try:
+        return time.time() - os.path.getmtime(os.path.join(_dir(ticker), 'synced')) > SYNC_TTL
+    except OSError:
+        return True
+
+def _sync_one(provider, ticker):
+    stored = columns(ticker)['Date']
+    if len(stored) == 0:
+        hist = provider.history(ticker, period=FIRST_PERIOD)
+    else:
+        # Start at the last stored bar so an intraday bar gets its final values.
+        last = pd.Timestamp(int(stored[-1]))
+        hist = provider.history(ticker, start=last.strftime('%Y-%m-%d'))
+    if hist is not None and len(hist) > 0:
+        _append(ticker, hist.sort_index())
+    os.makedirs(_dir(ticker), exist_ok=True)
+    with open(os.path.join(_dir(ticker), 'synced'), 'w'):
+        pass
+
+def sync(tickers, workers=8):
+    # Returns {ticker: reason} for the tickers that could not be updated.
+    provider = market_data.get_provider()
+    wanted = list(dict.fromkeys(tickers))
+    stale = [] if _read_only else [ticker for ticker in wanted if _stale(ticker)]
+    profiler.cache(hits=len(wanted) - len(stale), misses=len(stale))
+    failed = {}
+    if not stale:
+        return failed
+
+    resolve(pd)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {ticker: executor.submit(_sync_one, provider, ticker) for ticker in stale}
+    for ticker, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            failed[ticker] = f'{type(e).__name__}: {e}'
+    return failed
+
+def _start(dates, period):
+    offset = period_offset(period)
+    if offset is None or len(dates) == 0:
+        return 0
+    if isinstance(offset, int):
+        return max(len(dates) - offset, 0)
+    start = pd.Timestamp(int(dates[-1])) - offset
+    return int(np.searchsorted(dates, start.value, side='right'))
+
+def window(ticker, period='1y', field='Close'):
+    # A Series over a slice of the memory map; no data is copied.
+    maps = columns(ticker)
+    start = _start(maps['Date'], period)
+    index = pd.DatetimeIndex(maps['Date'][start:].view('datetime64[ns]'))
+    return pd.Series(maps[field][start:], index=index, name=ticker, copy=False)
+
+def prices(tickers, period='1y', field='Close'):
+    sync(tickers)
+    return pd.DataFrame({ticker: window(ticker, period, field) for ticker in tickers})
+
+def closes(tickers, period='1y'):
+    return prices(tickers, period, 'Close')
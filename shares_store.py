@@ -0,0 +1,95 @@
+#! /usr/bin/python3
+
+import os
+import json
+import datetime
+import concurrent.futures
+import profiler
+import market_data
+from lazy import lazy_import, resolve
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+STORE_FILE = os.environ.get('PORTFOLIO_SHARES_STORE', os.path.join('.cache', 'shares.json'))
+FIRST_SYNC = '2023-01-01'
+
+# Per provider and ticker: [shares outstanding, as-of date of that count, date last synced].
+_store = None
+
+def load():
+    global _store
+    if _store is None:
+        try:
+            with open(STORE_FILE, 'r') as json_file:
+                _store = json.load(json_file)
+        except (OSError, ValueError):
+            _store = {}
+    return _store
+
+def save():
+    directory = os.path.dirname(STORE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = STORE_FILE + '.tmp'
+    with open(tmp, 'w') as json_file:
+        json.dump(_store, json_file)
+    os.replace(tmp, STORE_FILE)
+
+def _delta(provider, symbol, entry):
+    # Only ask for counts published after the one we already hold.
+    if entry is None:
+        start = FIRST_SYNC
+    else:
+        start = (datetime.date.fromisoformat(entry[1]) + datetime.timedelta(days=1)).isoformat()
+    shares = provider.shares(symbol, start=start)
+    if shares is None:
+        return None
+    shares = shares.dropna()
+    if len(shares) == 0:
+        return None
+    return [int(shares.iloc[-1]), shares.index[-1].date().isoformat()]
+
+def sync(symbols, workers=8):
+    provider = market_data.get_provider()
+    entries = load().setdefault(provider.name, {})
+    today = datetime.date.today().isoformat()
+    wanted = list(dict.fromkeys(symbols))
+    stale = [symbol for symbol in wanted if symbol not in entries or entries[symbol][2] != today]
+    profiler.cache(hits=len(wanted) - len(stale), misses=len(stale))
+
+    failed = {}
+    if stale:
+        resolve(pd)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {symbol: executor.submit(_delta, provider, symbol, entries.get(symbol)) for symbol in stale}
+        for symbol, future in futures.items():
+            try:
+                latest = future.result()
+            except Exception as e:
+                failed[symbol] = f'{type(e).__name__}: {e}'
+                continue
+            if latest is not None:
+                entries[symbol] = latest + [today]
+            elif symbol in entries:
+                entries[symbol][2] = today
+            else:
+                failed[symbol] = 'no shares outstanding data'
+        try:
+            save()
+        except OSError:
+            pass
+
+    shares = {symbol: entries[symbol][0] for symbol in symbols if symbol in entries}
+    return shares, failed
+
+def market_caps(symbols, prices):
+    # Returns (DataFrame of Shares, MktCap, Current, {symbol: reason}); unknown share counts are NaN.
+    shares, failed = sync(symbols)
+    counts = np.array([shares.get(symbol, np.nan) for symbol in symbols], dtype=np.float64)
+    if isinstance(prices, pd.Series):
+        current = prices.reindex(symbols).astype(float)
+    else:
+        current = pd.Series(prices, index=symbols, dtype=float)
+    return pd.DataFrame({'Shares': counts, 'MktCap': counts * current.to_numpy(), 'Current': current},
+                        index=symbols), failed
@@ -0,0 +1,106 @@
+#! /usr/bin/python3
+
+import os
+import json
+import time
+import hashlib
+import inspect
+import functools
+import importlib.util
+import profiler
+import market_data
+import series_store
+import shares_store
+
+CACHE_DIR = os.environ.get('PORTFOLIO_SHEET_CACHE', os.path.join('.cache', 'sheets'))
+CACHE_TTL = float(os.environ.get('PORTFOLIO_SHEET_CACHE_TTL', 7 * 24 * 60 * 60))
+# Modules the builders compute with. Their source is part of every key, with
+# the builder's own module (helpers included), so a code change anywhere in
+# them invalidates the cached sheets.
+ENGINES = ('holdings', 'valuation', 'regression', 'growth', 'stats_engine', 'beta_engine')
+
+def holdings_digest(stock_dict):
+    digest = hashlib.sha256()
+    digest.update('\0'.join(stock_dict.symbols.tolist()).encode())
+    digest.update(stock_dict.shares.tobytes())
+    digest.update(stock_dict.totals.tobytes())
+    return digest.hexdigest()
+
+def market_digest(symbols):
+    # As-of state of the stored data: the last bar (date and close) of every
+    # ticker plus the shares-outstanding entries, so a revised bar counts too.
+    provider = market_data.get_provider().name
+    shares = shares_store.load().get(provider, {})
+    state = [provider]
+    for symbol in symbols:
+        columns = series_store.columns(symbol)
+        last = (int(columns['Date'][-1]), float(columns['Close'][-1])) if len(columns['Date']) else None
+        state.append((symbol, last, shares.get(symbol, [None, None])[:2]))
+    return hashlib.sha256(repr(state).encode()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def code_digest(filename):
+    digest = hashlib.sha256()
+    for path in [filename] + [importlib.util.find_spec(name).origin for name in ENGINES]:
+        with open(path, 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+def sheet_key(name, builder, holdings, market=None):
+    # The code (see ENGINES) and the builder's default parameters (p='20d',
+    # years=10, ...) are part of the key, so editing either invalidates it.
+    params = {key: value.default for key, value in inspect.signature(builder).parameters.items()
+              if value.default is not inspect.Parameter.empty}
+    parts = [name, code_digest(inspect.getsourcefile(builder)), repr(sorted(params.items())), holdings, market]
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key + '.json')
+
+def load(key):
+    try:
+        with open(_path(key), 'r') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+def store(key, rows):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f'{_path(key)}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as json_file:
+        json.dump(rows, json_file, default=lambda value: value.item())
+    os.replace(tmp, _path(key))
+    _evict()
+
+def _evict():
+    now = time.time()
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > CACHE_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+def cached_rows(key, rows):
+    # Returns (rows, reused). On a miss the builder's rows are streamed through
+    # and stored once the sheet has been produced completely.
+    cached = load(key)
+    profiler.cache(hits=cached is not None, misses=cached is None)
+    if cached is not None:
+        try:
+            os.utime(_path(key))
+        except OSError:
+            pass
+        return iter(cached), True
+    return _recording(key, rows), False
+
+def _recording(key, rows):
+    recorded = []
+    for row in rows:
+        recorded.append(list(row))
+        yield row
+    try:
+        store(key, recorded)
+    except OSError:
+        pass
@@ -0,0 +1,66 @@
+#! /usr/bin/python3
+
+import os
+import atomic
+import numpy as np
+from holdings import Holdings
+
+# Layout: a 32-byte header, then one fixed-width little-endian record per
+# position. Ticker width is stored in the header and kept a multiple of 8 so
+# the records stay aligned.
+EXTENSION = '.pfs'
+MAGIC = b'PFSNAP'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('width', '<u4'), ('count', '<u8'), ('flags', '<u8')])
+# Tickers are plain ASCII unless this flag says they are UTF-8.
+UTF8 = 1
+
+def record_dtype(width):
+    return np.dtype([('symbol', f'S{width}'), ('shares', '<i8'), ('total', '<f8')])
+
+def _encode(symbols):
+    # numpy's ASCII cast is several times faster than per-item encoding.
+    try:
+        return symbols.astype('S'), 0
+    except UnicodeEncodeError:
+        return np.char.encode(symbols, 'utf-8'), UTF8
+
+def write(filename, holdings):
+    symbols, flags = _encode(np.array(holdings.symbols, dtype=str)) if len(holdings) else (np.array([], dtype='S1'), 0)
+    width = max(8, -(-symbols.dtype.itemsize // 8) * 8)
+    records = np.empty(len(holdings), dtype=record_dtype(width))
+    records['symbol'] = symbols
+    records['shares'] = holdings.shares
+    records['total'] = holdings.totals
+    header = np.array([(MAGIC, VERSION, width, len(records), flags)], dtype=HEADER)
+
+    def write_records(snapshot_file):
+        snapshot_file.write(header.tobytes())
+        snapshot_file.write(records.tobytes())
+    atomic.replace_file(filename, write_records, 'wb')
+
+def _header(filename):
+    header = np.fromfile(filename, dtype=HEADER, count=1)
+    if len(header) == 0 or header['magic'][0] != MAGIC:
+        raise ValueError(f'{filename} is not a portfolio snapshot')
+    version, width, count = int(header['version'][0]), int(header['width'][0]), int(header['count'][0])
+    if version != VERSION:
+        raise ValueError(f'{filename} has snapshot version {version}, expected {VERSION}')
+    dtype = record_dtype(width)
+    if os.path.getsize(filename) != HEADER.itemsize + count * dtype.itemsize:
+        raise ValueError(f'{filename} is truncated')
+    return dtype, count, int(header['flags'][0])
+
+def records(filename):
+    # Read-only memory map of the records, checked against the header.
+    dtype, count, flags = _header(filename)
+    if count == 0:
+        return np.empty(0, dtype=dtype), flags
+    return np.memmap(filename, dtype=dtype, mode='r', offset=HEADER.itemsize, shape=(count,)), flags
+
+def read(filename):
+    data, flags = records(filename)
+    if len(data) == 0:
+        return Holdings()
+    symbols = np.char.decode(data['symbol'], 'utf-8') if flags & UTF8 else data['symbol'].astype(str)
+    return Holdings.from_arrays(symbols, data['shares'], data['total'])
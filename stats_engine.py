@@ -0,0 +1,61 @@
+#! /usr/bin/python3
+
+import numpy as np
+from market_data import period_days, slice_period
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+WINDOWS = ('20d', '2mo', '6mo', '1y')
+
+def longest(periods):
+    # The period whose window covers all the others, so one fetch serves them all.
+    return max(periods, key=period_days)
+
+def _returns(values):
+    # Daily returns of the forward-filled closes, as pandas' pct_change does.
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    return filled[1:] / filled[:-1] - 1
+
+def matrix_stats(closes, benchmark=None):
+    # One pass over a dates x tickers close matrix; NaN gaps are skipped per column.
+    values = closes.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=0)
+    zeroed = np.where(valid, values, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = zeroed.sum(axis=0) / count
+        centered = np.where(valid, values - mean, 0.0)
+        std = np.sqrt((centered ** 2).sum(axis=0) / (count - 1))
+
+        last = np.where(valid, np.arange(len(values))[:, None], -1).max(axis=0)
+        current = np.where(last >= 0, values[np.maximum(last, 0), np.arange(values.shape[1])], np.nan)
+        delta = current - mean
+
+        stats = pd.DataFrame({'Current': current, 'Mean': mean, 'Std': std}, index=closes.columns)
+        if benchmark is not None:
+            stats['IBOV Corr'] = _correlation(_returns(values), _returns(benchmark.to_numpy(dtype=np.float64))[:, 0])
+        stats['C<M'] = delta < 0
+        stats['C-M'] = delta
+        stats['(C-M)/S'] = delta / std
+    return stats
+
+def _correlation(returns, bench):
+    # Pearson correlation of every column with the benchmark over their common days.
+    pair = np.isfinite(returns) & np.isfinite(bench)[:, None]
+    count = pair.sum(axis=0)
+    x = np.where(pair, returns, 0.0)
+    y = np.where(pair, bench[:, None], 0.0)
+    x = np.where(pair, x - x.sum(axis=0) / count, 0.0)
+    y = np.where(pair, y - y.sum(axis=0) / count, 0.0)
+    return (x * y).sum(axis=0) / np.sqrt((x ** 2).sum(axis=0) * (y ** 2).sum(axis=0))
+
+def window_stats(closes, benchmark=None, windows=WINDOWS):
+    # {window: stats} from a single close matrix covering the longest window.
+    result = {}
+    for window in windows:
+        part = slice_period(closes, window)
+        bench = benchmark.reindex(part.index) if benchmark is not None else None
+        result[window] = matrix_stats(part, bench)
+    return result
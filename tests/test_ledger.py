@@ -0,0 +1,110 @@
+import datetime
+import pytest
+import ledger
+from holdings import Holdings
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Entries stamped at chosen local times instead of now.
+    times = []
+    monkeypatch.setattr(ledger.time, 'time_ns', lambda: times.pop(0))
+
+    def at(day, hour=12):
+        times.append(int(datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time(hour)).timestamp()) * 10**9)
+    return at
+
+def test_replay_after_reopen(tmp_path):
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    book.buy('PETR4.SA', 10, 10.0)
+    book.buy('A-VERY-LONG-TICKER-NAME.SA', 3, 7.5)
+    assert book.sell('PETR4.SA', 4, 12.0) == pytest.approx(4 * 12.0 - 4 * 10.0)
+    book.delete('A-VERY-LONG-TICKER-NAME.SA')
+    book.set('VALE3.SA', 2, 100.0)
+
+    reopened = ledger.Ledger(book.path)
+    assert reopened.count == 5
+    assert reopened.holdings.to_dict() == book.holdings.to_dict()
+    assert reopened.holdings.to_dict() == {'PETR4.SA': [6, 60.0], 'VALE3.SA': [2, 100.0]}
+
+def test_checkpoints_match_full_replay(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, 'CHECKPOINT_EVERY', 3)
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    for i in range(10):
+        book.buy(f'T{i % 4}', i + 1, float(i))
+    assert book._checkpoints() == [3, 6, 9]
+
+    reopened = ledger.Ledger(book.path)
+    assert reopened.holdings.to_dict() == book.holdings.to_dict()
+    for stop in range(11):
+        full = Holdings()
+        reopened._apply_entries(full, 0, stop)
+        assert reopened.replay(stop).to_dict() == full.to_dict()
+
+def test_as_of(tmp_path, clock):
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    clock('2024-03-01')
+    book.buy('PETR4.SA', 10, 10.0)
+    clock('2024-03-01', 18)
+    book.buy('PETR4.SA', 5, 11.0)
+    clock('2024-03-04')
+    book.sell('PETR4.SA', 15, 12.0)
+    clock('2024-03-05')
+    book.buy('VALE3.SA', 1, 60.0)
+
+    assert book.as_of('2024-02-29').to_dict() == {}
+    assert book.as_of('2024-03-01').to_dict() == {'PETR4.SA': [15, 155.0]}
+    assert book.as_of(datetime.date(2024, 3, 3)).to_dict() == {'PETR4.SA': [15, 155.0]}
+    assert book.as_of('2024-03-04').to_dict() == {'PETR4.SA': [0, 0.0]}
+    assert book.as_of('2024-03-05').to_dict() == book.holdings.to_dict()
+
+def test_torn_record_is_truncated(tmp_path):
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    book.buy('PETR4.SA', 10, 10.0)
+    book.buy('VALE3.SA', 2, 50.0)
+    with open(book.entries_path, 'ab') as entries_file:
+        entries_file.write(b'\x01' * (ledger.RECORD.itemsize - 5))
+
+    reopened = ledger.Ledger(book.path)
+    assert reopened.count == 2
+    assert reopened.holdings.to_dict() == {'PETR4.SA': [10, 100.0], 'VALE3.SA': [2, 100.0]}
+    reopened.buy('ITUB4.SA', 1, 30.0)
+    assert ledger.Ledger(book.path).holdings['ITUB4.SA'] == [1, 30.0]
+
+def test_torn_symbol_line_is_dropped(tmp_path):
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    book.buy('PETR4.SA', 10, 10.0)
+    with open(book.symbols_path, 'a') as symbols_file:
+        symbols_file.write('"VALE')
+
+    reopened = ledger.Ledger(book.path)
+    assert reopened.symbols == ['PETR4.SA']
+    reopened.buy('VALE3.SA', 2, 50.0)
+    assert ledger.Ledger(book.path).holdings.to_dict() == {'PETR4.SA': [10, 100.0], 'VALE3.SA': [2, 100.0]}
+
+def test_rejected_trade_is_not_written(tmp_path):
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    book.buy('PETR4.SA', 1, 10.0)
+    with pytest.raises(ValueError):
+        book.sell('PETR4.SA', 2, 10.0)
+    assert ledger.Ledger(book.path).count == 1
+
+def test_open_for_prefers_the_file(tmp_path):
+    filename = str(tmp_path / 'p.json')
+    saved = Holdings.from_dict({'PETR4.SA': [100, 1000.0]})
+    book = ledger.open_for(filename, saved)
+    book.buy('PETR4.SA', 10, 10.0)
+    book.sell('PETR4.SA', 50, 12.0)
+
+    # Quit without saving: the file's holdings win.
+    reloaded = ledger.open_for(filename, saved)
+    assert reloaded.holdings.to_dict() == {'PETR4.SA': [100, 1000.0]}
+    count = reloaded.count
+    assert ledger.open_for(filename, saved).count == count
+
+def test_lots_follow_the_ledger(tmp_path):
+    book = ledger.Ledger(str(tmp_path / 'p.ledger'))
+    book.buy('PETR4.SA', 10, 10.0)
+    book.buy('PETR4.SA', 10, 20.0)
+    book.sell('PETR4.SA', 15, 25.0)
+    assert book.lots('fifo').realized['PETR4.SA'] == pytest.approx(15 * 25.0 - 200.0)
+    assert book.lots('average').realized['PETR4.SA'] == pytest.approx(15 * 25.0 - 225.0)
@@ -0,0 +1,51 @@
+import pytest
+from lots import Lots, LotBook
+
+def test_fifo_sells_oldest_lots_first():
+    book = LotBook('fifo')
+    book.buy('PETR4', 10, 10.0)
+    book.buy('PETR4', 10, 20.0)
+    assert book.sell('PETR4', 15, 25.0) == pytest.approx(15 * 25.0 - (10 * 10.0 + 5 * 20.0))
+    assert book.lots['PETR4'].shares == 5
+    assert book.lots['PETR4'].cost == pytest.approx(5 * 20.0)
+
+def test_average_sells_at_pooled_cost():
+    book = LotBook('average')
+    book.buy('PETR4', 10, 10.0)
+    book.buy('PETR4', 10, 20.0)
+    assert book.sell('PETR4', 15, 25.0) == pytest.approx(15 * 25.0 - 15 * 15.0)
+    assert book.lots['PETR4'].cost == pytest.approx(5 * 15.0)
+
+def test_methods_agree_once_position_is_closed():
+    gains = {}
+    for method in ('fifo', 'average'):
+        book = LotBook(method)
+        book.buy('VALE3', 3, 50.0)
+        book.buy('VALE3', 7, 60.0)
+        book.sell('VALE3', 4, 70.0)
+        book.sell('VALE3', 6, 55.0)
+        gains[method] = book.realized['VALE3']
+    assert gains['fifo'] == pytest.approx(gains['average'])
+    assert gains['fifo'] == pytest.approx(4 * 70.0 + 6 * 55.0 - (3 * 50.0 + 7 * 60.0))
+
+def test_fifo_partial_sells_across_many_lots():
+    lots = Lots(fifo=True)
+    for price in range(1, 201):
+        lots.buy(1, float(price))
+    basis = 0.0
+    for _ in range(150):
+        basis += 1 * 100.0 - lots.sell(1, 100.0)
+    assert basis == pytest.approx(sum(range(1, 151)))
+    assert lots.shares == 50
+    assert lots.cost == pytest.approx(sum(range(151, 201)))
+
+def test_short_sale_is_rejected():
+    book = LotBook()
+    book.buy('ITUB4', 5, 30.0)
+    with pytest.raises(ValueError):
+        book.sell('ITUB4', 6, 30.0)
+    assert book.lots['ITUB4'].shares == 5
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        LotBook('lifo')
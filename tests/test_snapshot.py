@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import snapshot
+from holdings import Holdings
+
+def _round_trip(tmp_path, holdings):
+    filename = str(tmp_path / ('p' + snapshot.EXTENSION))
+    snapshot.write(filename, holdings)
+    return filename, snapshot.read(filename)
+
+def test_ascii_round_trip(tmp_path):
+    holdings = Holdings.from_dict({'PETR4.SA': [100, 1234.5], 'VALE3.SA': [7, 0.1], 'BRK-B': [0, 0.0]})
+    filename, read = _round_trip(tmp_path, holdings)
+    assert read.to_dict() == holdings.to_dict()
+    assert snapshot.records(filename)[1] == 0
+
+def test_utf8_round_trip(tmp_path):
+    holdings = Holdings.from_dict({'AÇÃO3.SA': [3, 30.0], 'PETR4.SA': [1, 10.0], '株式': [2, 5.5]})
+    filename, read = _round_trip(tmp_path, holdings)
+    assert read.to_dict() == holdings.to_dict()
+    assert list(read.symbols) == list(holdings.symbols)
+    assert snapshot.records(filename)[1] & snapshot.UTF8
+
+def test_empty_round_trip(tmp_path):
+    filename, read = _round_trip(tmp_path, Holdings())
+    assert len(read) == 0
+
+def test_records_stay_aligned(tmp_path):
+    filename, _ = _round_trip(tmp_path, Holdings.from_dict({'A-LONGER-TICKER.SA': [1, 1.0]}))
+    data, _ = snapshot.records(filename)
+    assert data.dtype.itemsize % 8 == 0
+    assert data['symbol'].dtype.itemsize >= len('A-LONGER-TICKER.SA')
+
+def test_truncated_snapshot_is_rejected(tmp_path):
+    filename, _ = _round_trip(tmp_path, Holdings.from_dict({'PETR4.SA': [1, 1.0], 'VALE3.SA': [2, 2.0]}))
+    with open(filename, 'r+b') as snapshot_file:
+        snapshot_file.truncate(snapshot.HEADER.itemsize + 5)
+    with pytest.raises(ValueError, match='truncated'):
+        snapshot.read(filename)
+
+def test_not_a_snapshot(tmp_path):
+    filename = str(tmp_path / 'p.pfs')
+    np.zeros(8, dtype=np.int64).tofile(filename)
+    with pytest.raises(ValueError, match='not a portfolio snapshot'):
+        snapshot.read(filename)
+
+def test_failed_write_keeps_the_old_snapshot(tmp_path, monkeypatch):
+    holdings = Holdings.from_dict({'PETR4.SA': [1, 1.0]})
+    filename, _ = _round_trip(tmp_path, holdings)
+
+    def fail(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr(snapshot.os, 'replace', fail)
+    with pytest.raises(OSError):
+        snapshot.write(filename, Holdings.from_dict({'VALE3.SA': [2, 2.0]}))
+    assert snapshot.read(filename).to_dict() == holdings.to_dict()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['p.pfs']
@@ -0,0 +1,52 @@
+#! /usr/bin/python3
+
+import numpy as np
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+def share_vector(columns, stock_dict):
+    return stock_dict.shares_for(columns)
+
+def fill_missing(prices, missing='ffill'):
+    empty = [column for column in prices.columns if prices[column].isna().all()]
+    if empty:
+        raise ValueError(f'No prices for {", ".join(empty)}')
+
+    if missing == 'ffill':
+        # Carry the last known price forward; drop dates before every ticker has traded.
+        return prices.ffill().dropna(how='any')
+    elif missing == 'drop':
+        return prices.dropna(how='any')
+    elif missing == 'raise':
+        gaps = prices.isna()
+        if gaps.any().any():
+            tickers = ', '.join(prices.columns[gaps.any()])
+            raise ValueError(f'Missing prices for {tickers}')
+        return prices
+    else:
+        raise ValueError(f'Unknown missing price policy "{missing}"')
+
+def portfolio_value(prices, stock_dict, missing='ffill'):
+    prices = fill_missing(prices, missing)
+    shares = share_vector(prices.columns, stock_dict)
+    return pd.Series(prices.to_numpy() @ shares, index=prices.index)
+
+def position_values(prices, stock_dict, missing='ffill'):
+    prices = fill_missing(prices, missing)
+    return prices * share_vector(prices.columns, stock_dict)
+
+def portfolio_ohlc(fields, stock_dict, missing='ffill'):
+    names = list(fields.keys())
+    closes = fill_missing(fields[names[0]], missing)
+    index, columns = closes.index, closes.columns
+
+    matrix = []
+    for name in names:
+        frame = fields[name].reindex(index=index, columns=columns)
+        # Missing highs/lows fall back to the (already filled) close.
+        matrix.append(frame.fillna(closes).to_numpy())
+
+    shares = share_vector(columns, stock_dict)
+    values = np.stack(matrix) @ shares
+    return pd.DataFrame(values.T, index=index, columns=names)
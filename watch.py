@@ -0,0 +1,179 @@
+#! /usr/bin/python3
+
+import sys
+import time
+import asyncio
+import background
+import market_data
+import series_store
+import beta_engine
+from commands import IBOV
+from lazy import lazy_import, resolve
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+HEADER = "__Stock___|_Current__|__Close___|__Delta1__|_Delta2_|__Beta__|_Volume(c)__|___Delta3___|"
+TOP = 4
+# Betas are the trailing-window regression ones: a ratio of today's moves
+# blows up whenever IBOV barely moves.
+BETA_WINDOW = beta_engine.WINDOWS[0]
+
+def _closes(provider, symbol):
+    close = provider.history(symbol, period='2d')['Close'].dropna()
+    if len(close) == 0:
+        raise ValueError('no prices')
+    return float(close.iloc[0]), float(close.iloc[-1])
+
+class Watch:
+    # Live table for beta and portfolio value. Prices are polled concurrently;
+    # the totals (and the value-weighted beta) are adjusted by each changed
+    # row, and only changed lines are redrawn.
+    def __init__(self, stock_dict, out=None, workers=8):
+        self.out = out if out is not None else sys.stdout
+        self.workers = workers
+        self.symbols = list(stock_dict.symbols)
+        self.shares = np.array(stock_dict.shares, dtype=np.float64)
+        self.totals = np.array(stock_dict.totals, dtype=np.float64)
+        self.close = np.full(len(self.symbols), np.nan)
+        self.current = np.full(len(self.symbols), np.nan)
+        self.betas = np.full(len(self.symbols), np.nan)
+        self.ibov = (np.nan, np.nan)
+        self.invested = round(stock_dict.invested, 2)
+        self.value = 0.0
+        self.yday = 0.0
+        # Sum of value * beta, and how many priced rows have a beta.
+        self.weighted = 0.0
+        self.beta_rows = 0
+        # Requests still running after their round timed out, by ticker.
+        self.pending = {}
+        self.failed = {}
+        self.rounds = 0
+        self.updated = None
+
+    def ibov_var(self):
+        close, current = self.ibov
+        return np.float64(current - close) / close * 100
+
+    def load_betas(self):
+        # From daily closes, so they hold for the whole session.
+        windows = (BETA_WINDOW,)
+        closes = series_store.closes(self.symbols + [IBOV], period=beta_engine.period(windows)).ffill()
+        stock_betas = beta_engine.betas(closes[self.symbols], closes[IBOV], windows)
+        self.betas = stock_betas[f'Beta{BETA_WINDOW}'].to_numpy(dtype=np.float64)
+
+    def portfolio_beta(self):
+        # Value-weighted over the priced rows, as beta_engine.portfolio_beta.
+        if not self.beta_rows or not self.value:
+            return np.nan
+        return self.weighted / self.value
+
+    def update(self, i, close, current):
+        old_close, old_current = self.close[i], self.current[i]
+        if close == old_close and current == old_current:
+            return False
+        self.value += self.shares[i] * (current - np.nan_to_num(old_current))
+        if np.isfinite(self.betas[i]):
+            self.weighted += self.shares[i] * self.betas[i] * (current - np.nan_to_num(old_current))
+            self.beta_rows += np.isnan(old_current)
+        self.yday += self.shares[i] * (close - np.nan_to_num(old_close))
+        self.close[i], self.current[i] = close, current
+        return True
+
+    def row(self, i):
+        close, current = self.close[i], self.current[i]
+        if np.isnan(current):
+            return f"{self.symbols[i]:9} |  waiting for prices"
+        delta1 = current - close
+        delta2 = np.float64(delta1) / close * 100
+        volume = current * self.shares[i]
+        return (f"{self.symbols[i]:9} | R$ {current:5.2f} | R$ {close:5.2f} | R$ {delta1:5.2f} | {delta2:5.2f}% "
+                f"| {self.betas[i]:6.2f} | R$ {volume:8,.2f}| R$ {volume - self.totals[i]:7.2f} |")
+
+    def summary(self):
+        port_var = np.float64(self.value - self.yday) / self.yday * 100 if self.yday else np.nan
+        delta1 = self.value - self.invested
+        delta2 = delta1 / self.invested * 100 if self.invested > 0 else 0.0
+        return [f"Portfolio value is R$ {self.value:,.2f} (invested R$ {self.invested:,.2f})",
+                f"delta1: R$ {delta1:.2f} | delta2: {delta2:.2f}%",
+                f"Portfolio variation: {port_var:.2f}% | IBOV variation: {self.ibov_var():.2f}% "
+                f"| Beta ({BETA_WINDOW}d): {self.portfolio_beta():.2f}"]
+
+    def status(self):
+        when = time.strftime('%H:%M:%S', self.updated) if self.updated else '--:--:--'
+        line = f"Watching {len(self.symbols)} stocks | round {self.rounds} at {when} | Ctrl+C to stop"
+        if self.failed:
+            line += ' | stale: ' + ', '.join(sorted(self.failed))
+        return line
+
+    def _line(self, number, text):
+        self.out.write(f"\x1b[{number};1H{text}\x1b[K")
+
+    def draw(self):
+        self.out.write("\x1b[2J")
+        self._line(1, self.status())
+        self._line(TOP - 1, HEADER)
+        self.redraw(range(len(self.symbols)))
+
+    def redraw(self, rows):
+        self._line(1, self.status())
+        for i in rows:
+            self._line(TOP + i, self.row(i))
+        bottom = TOP + len(self.symbols) + 1
+        for offset, text in enumerate(self.summary()):
+            self._line(bottom + offset, text)
+        self.out.write(f"\x1b[{bottom + 3};1H")
+        self.out.flush()
+
+    async def _poll(self, provider, symbol, limit, timeout):
+        # A request that timed out is awaited again next round instead of
+        # starting another, so at most one thread per ticker is left running.
+        async with limit:
+            future = self.pending.get(symbol)
+            if future is None:
+                future = self.pending[symbol] = background.submit(_closes, provider, symbol)
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            finally:
+                if future.done():
+                    del self.pending[symbol]
+
+    async def poll(self, interval):
+        # One round: a failed or late symbol keeps its last-known prices.
+        provider = market_data.get_provider()
+        limit = asyncio.Semaphore(self.workers)
+        tickers = self.symbols + [IBOV]
+        results = await asyncio.gather(*(self._poll(provider, ticker, limit, interval) for ticker in tickers),
+                                       return_exceptions=True)
+
+        changed = []
+        for i, (ticker, result) in enumerate(zip(tickers, results)):
+            if isinstance(result, BaseException):
+                self.failed[ticker] = 'timed out' if isinstance(result, asyncio.TimeoutError) else str(result)
+                continue
+            self.failed.pop(ticker, None)
+            if ticker == IBOV:
+                # Only the summary shows it, and that is redrawn every round.
+                self.ibov = result
+            elif self.update(i, *result):
+                changed.append(i)
+
+        self.rounds += 1
+        self.updated = time.localtime()
+        return changed
+
+    async def run(self, interval=30.0, rounds=None):
+        resolve(pd)
+        try:
+            await asyncio.to_thread(self.load_betas)
+        except Exception as error:
+            self.failed['beta'] = str(error)
+        self.draw()
+        while rounds is None or self.rounds < rounds:
+            start = time.monotonic()
+            self.redraw(await self.poll(interval))
+            if rounds is None or self.rounds < rounds:
+                await asyncio.sleep(max(interval - (time.monotonic() - start), 0.0))
+
+def watch(stock_dict, interval=30.0, rounds=None):
+    asyncio.run(Watch(stock_dict).run(interval, rounds))